@@ -5,6 +5,7 @@ Author: Hongjie Fang.
 '''
 
 import re
+from easyrobot.utils.worker import DeviceProcess
 from easyrobot.camera.base import RGBCameraBase, RGBDCameraBase
 from easyrobot.camera.realsense import RealSenseRGBDCamera
 
@@ -22,7 +23,10 @@ def get_rgb_camera(**params):
 def get_rgbd_camera(**params):
     '''
     Get the camera object from the camera library.
+    If "process" is set in the parameters, the camera is built and runs in its own worker process, and a proxy of the camera is returned.
     '''
+    if params.pop('process', False):
+        return DeviceProcess(get_rgbd_camera, params, logger_name = '{} Process'.format(params.get('logger_name', 'Camera')))
     name = params.get('name', None)
     if name is not None:
         del params['name']
@@ -4,21 +4,23 @@ Camera Base Interface.
 Author: Hongjie Fang.
 '''
 
-import time
 import logging
-import threading
 import numpy as np
 
 from easyrobot.utils.logger import ColoredLogger
-from easyrobot.utils.shared_memory import SharedMemoryManager
+from easyrobot.camera.preprocess import FramePreprocessor
+from easyrobot.camera.pointcloud import PointCloudGenerator
+from easyrobot.utils.streaming import StreamingBase
+from easyrobot.utils.shared_memory import SharedMemoryManager, record_dtype
 
 
-class RGBCameraBase(object):
+class RGBCameraBase(StreamingBase):
     def __init__(
         self, 
         logger_name: str = "RGB Camera",
         shm_name: str = None, 
         streaming_freq: int = 30, 
+        lock_shm: bool = False,
         **kwargs
     ): 
         '''
@@ -27,7 +29,8 @@ class RGBCameraBase(object):
         Parameters:
         - logger_name: str, optional, default: "RGBCamera", the name of the logger;
         - shm_name: str, optional, default: None, the shared memory name of the camera data, None means no shared memory object;
-        - streaming_freq: int, optional, default: 30, the streaming frequency.
+        - streaming_freq: int, optional, default: 30, the streaming frequency;
+        - lock_shm: bool, optional, default: False, whether to pre-fault and lock the shared memory segments in memory and request transparent huge pages for them, which avoids latency spikes from page faults and swapping.
         '''
         super(RGBCameraBase, self).__init__()
         logging.setLoggerClass(ColoredLogger)
@@ -35,6 +38,7 @@ class RGBCameraBase(object):
         self.is_streaming = False
         self.with_streaming = (shm_name is not None)
         self.streaming_freq = streaming_freq
+        self.lock_shm = lock_shm
         self.shm_name = shm_name
         self._prepare_shm()
 
@@ -44,43 +48,16 @@ class RGBCameraBase(object):
         '''
         if self.with_streaming:
             info = np.array(self.get_info()).astype(np.uint8)
-            self.shm_camera = SharedMemoryManager(self.shm_name, 0, info.shape, info.dtype)
+            self.shm_camera = SharedMemoryManager(self.shm_name, 0, info.shape, info.dtype, versioned = True, fields = self.get_info_fields(), rate = self.streaming_freq, notify = True, triple_buffer = True, lock_memory = self.lock_shm, huge_pages = self.lock_shm)
+            self._check_memory(self.shm_camera)
             self.shm_camera.execute(info)
-        
-    def streaming(self, delay_time = 0.0):
-        '''
-        Start streaming.
-        
-        Parameters:
-        - delay_time: float, optional, default: 0.0, the delay time before collecting data.
-        '''
-        if self.with_streaming is False:
-            raise AttributeError('If you want to use streaming function, the "shm_name" attribute should be set correctly.')
-        self.thread = threading.Thread(target = self.streaming_thread, kwargs = {'delay_time': delay_time})
-        self.thread.setDaemon(True)
-        self.thread.start()
-    
-    def streaming_thread(self, delay_time = 0.0):
-        time.sleep(delay_time)
-        self.is_streaming = True
-        self.logger.info('Start streaming ...')
-        while self.is_streaming:
-            self.shm_camera.execute((self.get_info()).astype(np.uint8))
-            time.sleep(1.0 / self.streaming_freq)
-    
-    def stop_streaming(self, permanent = True):
-        '''
-        Stop streaming process.
 
-        Parameters:
-        - permanent: bool, optional, default: True, whether the streaming process is stopped permanently.
-        '''
-        self.is_streaming = False
-        self.thread.join()
-        self.logger.info('Close streaming.')
-        if permanent:
-            self._close_shm()
-            self.with_streaming = False
+    def _streaming_out(self):
+        # Frames are collected straight into the back buffer of the triple-buffered segment.
+        return self.shm_camera.back_buffer()
+
+    def _publish(self, data, timestamp = None, device_timestamp = 0):
+        self.shm_camera.execute(data, timestamp = timestamp, device_timestamp = device_timestamp)
     
     def _close_shm(self):
         '''
@@ -90,11 +67,20 @@ class RGBCameraBase(object):
             self.shm_camera.close()
         
 
-    def get_info(self):
+    def get_info(self, out = None):
         '''
         Get the camera observation (RGB).
+
+        Parameters:
+        - out: np.array, optional, default: None, the preallocated array that the observation is written into, None means a new array.
+        '''
+        return np.array([]) if out is None else out
+
+    def get_info_fields(self):
+        '''
+        Get the names of the entries of the camera information, None means unnamed entries.
         '''
-        return np.array([])
+        return None
     
     def stop(self):
         '''
@@ -107,13 +93,23 @@ class RGBCameraBase(object):
 
 
 
-class RGBDCameraBase(object):
+class RGBDCameraBase(StreamingBase):
+    _streaming_requirement = 'either "shm_name_rgb" attribute, "shm_name_depth" attribute, "shm_name" attribute or "shm_name_pointcloud" attribute should be set correctly'
+    # Cameras with raw depth stream the native np.uint16 depth, along with the number of depth units per meter ("depth_scale" in the metadata).
+    raw_depth = False
+    depth_scale = 1.0
+
     def __init__(
         self, 
         logger_name: str = "RGBD Camera",
         shm_name_rgb: str = None, 
         shm_name_depth: str = None,
+        shm_name: str = None,
+        shm_name_pointcloud: str = None,
+        pointcloud_stride: int = 1,
+        preprocess: dict = None,
         streaming_freq: int = 30, 
+        lock_shm: bool = False,
         **kwargs
     ): 
         '''
@@ -123,7 +119,12 @@ class RGBDCameraBase(object):
         - logger_name: str, optional, default: "RGBDCamera", the name of the logger;
         - shm_name_rgb: str, optional, default: None, the shared memory name of the camera RGB data, None means no shared memory object for RGB data;
         - shm_name_depth: str, optional, default: None, the shared memory name of the camera depth data, None means no shared memory object for depth data;
-        - streaming_freq: int, optional, default: 30, the streaming frequency.
+        - shm_name: str, optional, default: None, the shared memory name of the camera RGB-D record, which holds the "rgb" and the "depth" fields of the same frame, None means no shared memory object for RGB-D records;
+        - shm_name_pointcloud: str, optional, default: None, the shared memory name of the organized point clouds (x, y, z in meters and r, g, b in [0, 1] of every strided pixel, see `PointCloudGenerator`), computed from the camera intrinsics in the streaming loop, None means no shared memory object for point clouds;
+        - pointcloud_stride: int, optional, default: 1, the pixel stride of the streamed point clouds;
+        - preprocess: dict, optional, default: None, the parameters of the `FramePreprocessor` (roi, stride, area, channels) that crops and downsamples the streamed frames once before they are published, None means the full frames;
+        - streaming_freq: int, optional, default: 30, the streaming frequency;
+        - lock_shm: bool, optional, default: False, whether to pre-fault and lock the shared memory segments in memory and request transparent huge pages for them, which avoids latency spikes from page faults and swapping.
         '''
         super(RGBDCameraBase, self).__init__()
         logging.setLoggerClass(ColoredLogger)
@@ -131,10 +132,17 @@ class RGBDCameraBase(object):
         self.is_streaming = False
         self.with_streaming_rgb = (shm_name_rgb is not None)
         self.with_streaming_depth = (shm_name_depth is not None)
-        self.with_streaming = self.with_streaming_rgb or self.with_streaming_depth
+        self.with_streaming_rgbd = (shm_name is not None)
+        self.with_streaming_pointcloud = (shm_name_pointcloud is not None)
+        self.with_streaming = self.with_streaming_rgb or self.with_streaming_depth or self.with_streaming_rgbd or self.with_streaming_pointcloud
         self.streaming_freq = streaming_freq
+        self.lock_shm = lock_shm
         self.shm_name_rgb = shm_name_rgb
         self.shm_name_depth = shm_name_depth
+        self.shm_name = shm_name
+        self.shm_name_pointcloud = shm_name_pointcloud
+        self.pointcloud_stride = pointcloud_stride
+        self.preprocessor = FramePreprocessor(**preprocess) if preprocess is not None else None
         self._prepare_shm()
 
     def _prepare_shm(self):
@@ -144,55 +152,70 @@ class RGBDCameraBase(object):
         if self.with_streaming:
             rgb, depth = self.get_info()
             rgb = np.array(rgb).astype(np.uint8)
-            depth = np.array(depth).astype(np.float32)
+            depth = np.array(depth).astype(np.uint16 if self.raw_depth else np.float32)
+            self.streaming_buffer = (np.empty_like(rgb), np.empty_like(depth))
+            rgb_meta = {}
+            if self.preprocessor is not None:
+                # The segments hold the preprocessed frames.
+                rgb = self.preprocessor.apply(rgb)
+                depth = self.preprocessor.apply(depth, depth = True)
+                self.preprocessed_buffer = (np.empty_like(rgb), np.empty_like(depth))
+                rgb_meta['preprocess'] = self.preprocessor.get_config()
+            depth_meta = dict(rgb_meta, depth_scale = self.depth_scale) if self.raw_depth else rgb_meta
             if self.with_streaming_rgb:
-                self.shm_camera_rgb = SharedMemoryManager(self.shm_name_rgb, 0, rgb.shape, rgb.dtype)
+                self.shm_camera_rgb = SharedMemoryManager(self.shm_name_rgb, 0, rgb.shape, rgb.dtype, versioned = True, rate = self.streaming_freq, meta = rgb_meta, notify = True, triple_buffer = True, lock_memory = self.lock_shm, huge_pages = self.lock_shm)
+                self._check_memory(self.shm_camera_rgb)
                 self.shm_camera_rgb.execute(rgb)
             if self.with_streaming_depth:
-                self.shm_camera_depth = SharedMemoryManager(self.shm_name_depth, 0, depth.shape, depth.dtype)
+                self.shm_camera_depth = SharedMemoryManager(self.shm_name_depth, 0, depth.shape, depth.dtype, versioned = True, rate = self.streaming_freq, meta = depth_meta, notify = True, triple_buffer = True, lock_memory = self.lock_shm, huge_pages = self.lock_shm)
+                self._check_memory(self.shm_camera_depth)
                 self.shm_camera_depth.execute(depth)
-        
-    def streaming(self, delay_time = 0.0):
+            if self.with_streaming_rgbd:
+                record = {'rgb': rgb, 'depth': depth}
+                self.shm_camera = SharedMemoryManager(self.shm_name, 0, (), record_dtype(record), versioned = True, rate = self.streaming_freq, meta = depth_meta, notify = True, triple_buffer = True, lock_memory = self.lock_shm, huge_pages = self.lock_shm)
+                self._check_memory(self.shm_camera)
+                self.shm_camera.execute(record)
+            if self.with_streaming_pointcloud:
+                intrinsic = self.get_intrinsic()
+                if intrinsic is None:
+                    raise AttributeError('Point cloud streaming requires the camera intrinsics.')
+                if self.preprocessor is not None:
+                    intrinsic = self.preprocessor.transform_intrinsic(intrinsic, depth = True)
+                self.pointcloud_generator = PointCloudGenerator(intrinsic, stride = self.pointcloud_stride, depth_scale = self.depth_scale if self.raw_depth else 1.0)
+                cloud = self.pointcloud_generator.compute(depth, rgb)
+                self.shm_camera_pointcloud = SharedMemoryManager(self.shm_name_pointcloud, 0, cloud.shape, cloud.dtype, versioned = True, fields = ['x', 'y', 'z', 'r', 'g', 'b'], rate = self.streaming_freq, meta = dict(rgb_meta, stride = self.pointcloud_stride), notify = True, triple_buffer = True, lock_memory = self.lock_shm, huge_pages = self.lock_shm)
+                self._check_memory(self.shm_camera_pointcloud)
+                self.shm_camera_pointcloud.execute(cloud)
+
+    def _serialize(self, info):
         '''
-        Start streaming.
-        
-        Parameters:
-        - delay_time: float, optional, default: 0.0, the delay time before collecting data.
+        Convert the camera observation into the data of the shared memory objects, preprocessed (if required) in the preallocated buffers.
         '''
-        if self.with_streaming is False:
-            raise AttributeError('If you want to use streaming function, either "shm_name_rgb" attribute or "shm_name_depth" attribute should be set correctly.')
-        self.thread = threading.Thread(target = self.streaming_thread, kwargs = {'delay_time': delay_time})
-        self.thread.setDaemon(True)
-        self.thread.start()
-    
-    def streaming_thread(self, delay_time = 0.0):
-        time.sleep(delay_time)
-        self.is_streaming = True
-        self.logger.info('Start streaming ...')
-        while self.is_streaming:
-            rgb, depth = self.get_info()
-            rgb = np.array(rgb).astype(np.uint8)
-            depth = np.array(depth).astype(np.float32)
-            if self.with_streaming_rgb:
-                self.shm_camera_rgb.execute(rgb)
-            if self.with_streaming_depth:
-                self.shm_camera_depth.execute(depth)
-            time.sleep(1.0 / self.streaming_freq)
+        rgb, depth = super(RGBDCameraBase, self)._serialize(info)
+        if self.preprocessor is None:
+            return rgb, depth
+        rgb_out, depth_out = self.preprocessed_buffer
+        return self.preprocessor.apply(rgb, out = rgb_out), self.preprocessor.apply(depth, out = depth_out, depth = True)
+
+    def _publish(self, data, timestamp = None, device_timestamp = 0):
+        rgb, depth = data
+        if self.with_streaming_rgb:
+            self.shm_camera_rgb.execute(rgb, timestamp = timestamp, device_timestamp = device_timestamp)
+        if self.with_streaming_depth:
+            self.shm_camera_depth.execute(depth, timestamp = timestamp, device_timestamp = device_timestamp)
+        if self.with_streaming_rgbd:
+            self.shm_camera.execute({'rgb': rgb, 'depth': depth}, timestamp = timestamp, device_timestamp = device_timestamp)
+        if self.with_streaming_pointcloud:
+            # The point cloud is computed straight into the back buffer of the triple-buffered segment.
+            cloud = self.pointcloud_generator.compute(depth, rgb, out = self.shm_camera_pointcloud.back_buffer())
+            self.shm_camera_pointcloud.execute(cloud, timestamp = timestamp, device_timestamp = device_timestamp)
     
-    def stop_streaming(self, permanent = True):
+    def _stats_name(self):
         '''
-        Stop streaming process.
-
-        Parameters:
-        - permanent: bool, optional, default: True, whether the streaming process is stopped permanently.
+        Get the shared memory name that the stats block is named after.
         '''
-        self.is_streaming = False
-        self.thread.join()
-        self.logger.info('Close streaming.')
-        if permanent:
-            self._close_shm()
-            self.with_streaming = False
-    
+        return self.shm_name or self.shm_name_rgb or self.shm_name_depth or self.shm_name_pointcloud
+
     def _close_shm(self):
         '''
         Close shared memory objects.
@@ -201,12 +224,25 @@ class RGBDCameraBase(object):
             self.shm_camera_rgb.close()
         if self.with_streaming_depth:
             self.shm_camera_depth.close()
+        if self.with_streaming_rgbd:
+            self.shm_camera.close()
+        if self.with_streaming_pointcloud:
+            self.shm_camera_pointcloud.close()
 
-    def get_info(self):
+    def get_info(self, out = None):
         '''
         Get the camera observation (RGB-D).
+
+        Parameters:
+        - out: tuple of (np.array, np.array), optional, default: None, the preallocated RGB and depth arrays that the observation is written into, None means new arrays.
+        '''
+        return (np.array([]), np.array([])) if out is None else out
+
+    def get_intrinsic(self, return_mat = True):
+        '''
+        Get the camera intrinsics, None means unknown.
         '''
-        return np.array([]), np.array([])
+        return None
 
     def stop(self):
         '''
@@ -0,0 +1,168 @@
+'''
+Multi-Camera Manager: brings several RGB-D cameras up in parallel, captures their frames concurrently, and returns
+them as batched arrays (with the per-camera timestamps) in preallocated storage; the batches can be streamed as
+one shared memory record.
+
+Usage:
+    manager = MultiCameraManager([
+        {'name': 'realsense', 'serial': '...'},
+        {'name': 'realsense', 'serial': '...'}
+    ], shm_name = 'cameras')
+    rgb, depth, timestamps, device_timestamps = manager.get_info()
+
+Author: Hongjie Fang.
+'''
+
+import time
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from easyrobot.camera.api import get_rgbd_camera
+from easyrobot.utils.logger import ColoredLogger
+from easyrobot.utils.streaming import StreamingBase
+from easyrobot.utils.shared_memory import SharedMemoryManager, record_dtype
+
+
+class MultiCameraManager(StreamingBase):
+    '''
+    Multi-Camera Manager.
+    '''
+    def __init__(
+        self,
+        cameras,
+        logger_name: str = "Multi Camera Manager",
+        shm_name: str = None,
+        streaming_freq: int = 30,
+        lock_shm: bool = False,
+        **kwargs
+    ):
+        '''
+        Initialization.
+
+        Parameters:
+        - cameras: list, required, the RGB-D cameras, either built (`RGBDCameraBase` objects in this process) or as the parameters of `get_rgbd_camera`, which are built in parallel; all the cameras should produce frames of the same shapes and types, and raw depth of the same depth scale;
+        - logger_name: str, optional, default: "Multi Camera Manager", the name of the logger;
+        - shm_name: str, optional, default: None, the shared memory name of the batches, a record of the "rgb" (N, H, W, 3), the "depth" (N, H, W), the "timestamp" (N, ) and the "device_timestamp" (N, ) fields, None means no shared memory object;
+        - streaming_freq: int, optional, default: 30, the streaming frequency;
+        - lock_shm: bool, optional, default: False, whether to pre-fault and lock the shared memory segment in memory and request transparent huge pages for it.
+        '''
+        super(MultiCameraManager, self).__init__()
+        logging.setLoggerClass(ColoredLogger)
+        self.logger = logging.getLogger(logger_name)
+        self.is_streaming = False
+        self.with_streaming = (shm_name is not None)
+        self.streaming_freq = streaming_freq
+        self.lock_shm = lock_shm
+        self.shm_name = shm_name
+        # One worker per camera, so that all the cameras wait for their frames at the same time.
+        self.executor = ThreadPoolExecutor(max_workers = max(len(cameras), 1))
+        start = time.time()
+        self.cameras = list(self.executor.map(lambda camera: get_rgbd_camera(**camera) if isinstance(camera, dict) else camera, cameras))
+        self.num_cameras = len(self.cameras)
+        self.logger.info('{} cameras are ready in {:.2f} s.'.format(self.num_cameras, time.time() - start))
+        frames = list(self.executor.map(lambda camera: camera.get_info(), self.cameras))
+        rgb, depth = np.asarray(frames[0][0]), np.asarray(frames[0][1])
+        # The batch has one depth scale, so that the raw depth of every camera is converted into meters alike.
+        depth_scales = [getattr(camera, 'depth_scale', 1.0) if getattr(camera, 'raw_depth', False) else None for camera in self.cameras]
+        for i, (camera_rgb, camera_depth) in enumerate(frames):
+            if np.shape(camera_rgb) != rgb.shape or np.shape(camera_depth) != depth.shape or np.asarray(camera_depth).dtype != depth.dtype:
+                raise AttributeError('Camera {} produces frames of shapes {} and {}, while camera 0 produces frames of shapes {} and {}.'.format(i, np.shape(camera_rgb), np.shape(camera_depth), rgb.shape, depth.shape))
+            if depth_scales[i] != depth_scales[0]:
+                raise AttributeError('Camera {} produces depth of depth scale {}, while camera 0 produces depth of depth scale {}.'.format(i, depth_scales[i], depth_scales[0]))
+        self.rgb_shape, self.depth_shape, self.depth_dtype = rgb.shape, depth.shape, depth.dtype
+        self._prepare_shm()
+
+    def _allocate(self):
+        '''
+        Allocate the storage of one batch: RGB images, depth images, capture timestamps and device timestamps.
+        '''
+        return (
+            np.empty((self.num_cameras, ) + self.rgb_shape, dtype = np.uint8),
+            np.empty((self.num_cameras, ) + self.depth_shape, dtype = self.depth_dtype),
+            np.zeros(self.num_cameras, dtype = np.int64),
+            np.zeros(self.num_cameras, dtype = np.int64)
+        )
+
+    def _prepare_shm(self):
+        '''
+        Prepare shared memory objects.
+        '''
+        self.batch = self._allocate()
+        if self.with_streaming:
+            rgb, depth, timestamps, device_timestamps = self.get_info()
+            record = {'rgb': rgb, 'depth': depth, 'timestamp': timestamps, 'device_timestamp': device_timestamps}
+            meta = {'depth_scale': self.cameras[0].depth_scale} if getattr(self.cameras[0], 'raw_depth', False) else None
+            self.shm_cameras = SharedMemoryManager(self.shm_name, 0, (), record_dtype(record), versioned = True, rate = self.streaming_freq, meta = meta, notify = True, triple_buffer = True, lock_memory = self.lock_shm, huge_pages = self.lock_shm)
+            self._check_memory(self.shm_cameras)
+            self.shm_cameras.execute(record)
+            # Field views of the back buffers of the segment, which the batches are captured into.
+            self.buffer_fields = {
+                id(buffer): (buffer['rgb'], buffer['depth'], buffer['timestamp'], buffer['device_timestamp'])
+                for buffer in self.shm_cameras.buffer_views
+            }
+
+    def _capture(self, i, rgb, depth):
+        '''
+        Capture the frames of a camera into the batch, and get their timestamps.
+        '''
+        camera = self.cameras[i]
+        start = time.monotonic_ns()
+        camera.capture_timestamp, camera.device_timestamp = None, 0
+        out = (rgb[i], depth[i])
+        frames = camera.get_info(out = out)
+        # Cameras that do not write into out (e.g., the proxies of cameras in worker processes) return new arrays.
+        for frame, frame_out in zip(frames, out):
+            if not np.may_share_memory(frame, frame_out):
+                np.copyto(frame_out, frame, casting = 'unsafe')
+        capture_timestamp = camera.capture_timestamp
+        if capture_timestamp is None:
+            capture_timestamp = (start + time.monotonic_ns()) // 2
+        return capture_timestamp, camera.device_timestamp
+
+    def get_info(self, out = None):
+        '''
+        Capture the frames of all the cameras concurrently.
+
+        Parameters:
+        - out: tuple of (np.array, np.array, np.array, np.array), optional, default: None, the preallocated batch (see the returns) that the frames are written into, None means the storage of the manager, which is overwritten by the next call.
+
+        Returns:
+        - rgb: np.array of shape (N, H, W, 3), np.uint8, the RGB images;
+        - depth: np.array of shape (N, H, W), the depth images;
+        - timestamps: np.array of shape (N, ), np.int64, the monotonic capture times (in ns) of the frames;
+        - device_timestamps: np.array of shape (N, ), np.int64, the device timestamps (in ns) of the frames, 0 means unavailable.
+        '''
+        rgb, depth, timestamps, device_timestamps = self.batch if out is None else out
+        futures = [self.executor.submit(self._capture, i, rgb, depth) for i in range(self.num_cameras)]
+        for i, future in enumerate(futures):
+            timestamps[i], device_timestamps[i] = future.result()
+        # The batch is as old as its oldest frame.
+        self.capture_timestamp = int(timestamps.min())
+        return rgb, depth, timestamps, device_timestamps
+
+    def _streaming_out(self):
+        # Batches are captured straight into the back buffer of the triple-buffered segment.
+        return self.buffer_fields[id(self.shm_cameras.back_buffer())]
+
+    def _publish(self, data, timestamp = None, device_timestamp = 0):
+        # The batch has been captured into the (still pending) back buffer, which is published without copies.
+        self.shm_cameras.execute(self.shm_cameras.back_buffer(), timestamp = timestamp, device_timestamp = device_timestamp)
+
+    def _close_shm(self):
+        '''
+        Close shared memory objects.
+        '''
+        if self.with_streaming:
+            self.shm_cameras.close()
+
+    def stop(self):
+        '''
+        Stop, together with all the cameras.
+        '''
+        if self.is_streaming:
+            self.stop_streaming(permanent = True)
+        else:
+            self._close_shm()
+        list(self.executor.map(lambda camera: camera.stop(), self.cameras))
+        self.executor.shutdown(wait = True)
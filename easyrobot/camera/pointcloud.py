@@ -0,0 +1,108 @@
+'''
+Point Cloud Generator: back-projects depth images into point clouds with the camera intrinsics. The per-pixel
+ray directions are computed once per resolution (and stride), so that a point cloud takes one multiply per coordinate.
+
+Usage:
+    generator = PointCloudGenerator(camera.get_intrinsic(), stride = 2)
+    cloud = generator.compute(depth, rgb)
+
+Author: Hongjie Fang.
+'''
+
+import numpy as np
+
+
+# Size (in bytes) of the blocks of points filled at once.
+_BLOCK_SIZE = 1 << 20
+
+
+class PointCloudGenerator(object):
+    '''
+    Point Cloud Generator.
+    '''
+    def __init__(self, intrinsic, stride = 1, depth_scale = 1.0):
+        '''
+        Initialization.
+
+        Parameters:
+        - intrinsic: np.array of shape (3, 3), required, the camera intrinsic matrix, e.g., `get_intrinsic()` of the camera;
+        - stride: int, optional, default: 1, the pixel stride, e.g., 2 keeps one pixel out of 2 x 2;
+        - depth_scale: float, optional, default: 1.0, the number of depth units per meter of the depth images, e.g., the "depth_scale" of raw depth streams.
+        '''
+        super(PointCloudGenerator, self).__init__()
+        self.intrinsic = np.array(intrinsic, dtype = np.float64)
+        self.stride = int(stride)
+        if self.stride < 1:
+            raise AttributeError('Invalid stride in point cloud generator.')
+        self.depth_scale = depth_scale
+        self.rays = {}
+        self.depth_buffers = {}
+
+    def get_rays(self, shape):
+        '''
+        Get the (cached) ray directions of the strided pixels of depth images of the given shape, scaled by the depth scale,
+        so that the points are the rays multiplied by the raw depth.
+
+        Returns:
+        - np.array of shape (3, h, w), np.float32, where (h, w) is the strided shape; the channels are stored apart, which keeps every multiply contiguous.
+        '''
+        shape = tuple(shape[:2])
+        rays = self.rays.get(shape)
+        if rays is None:
+            fx, fy = self.intrinsic[0, 0], self.intrinsic[1, 1]
+            cx, cy = self.intrinsic[0, 2], self.intrinsic[1, 2]
+            v, u = np.mgrid[0: shape[0]: self.stride, 0: shape[1]: self.stride]
+            rays = np.stack([(u - cx) / fx, (v - cy) / fy, np.ones(u.shape)]) / self.depth_scale
+            rays = np.ascontiguousarray(rays, dtype = np.float32)
+            self.rays[shape] = rays
+            self.depth_buffers[shape] = np.empty(rays.shape[1:], dtype = np.float32)
+        return rays
+
+    def get_shape(self, shape, with_rgb = False):
+        '''
+        Get the shape (h, w, 3 or 6) of the organized point clouds of depth images of the given shape.
+        '''
+        h, w = self.get_rays(shape).shape[1:]
+        return (h, w, 6 if with_rgb else 3)
+
+    def compute(self, depth, rgb = None, out = None, mask = None, remove_invalid = False):
+        '''
+        Compute the point cloud of a depth image.
+
+        Parameters:
+        - depth: np.array of shape (H, W), required, the depth image (in 1 / depth_scale meters);
+        - rgb: np.array of shape (H, W, 3), optional, default: None, the aligned RGB image (np.uint8), whose colors (in [0, 1]) are appended to the points;
+        - out: np.array, optional, default: None, the preallocated np.float32 organized point cloud (see `get_shape`) that the points are written into, None means a new array;
+        - mask: np.array of bool, optional, default: None, the pixels to keep, of shape (H, W) or of the strided shape, None means all the pixels;
+        - remove_invalid: bool, optional, default: False, whether to remove the points without depth (zero depth).
+
+        Returns:
+        - The organized point cloud of shape (h, w, 3 or 6) if neither mask nor remove_invalid is given, where (h, w) is the strided shape;
+        - the points of shape (N, 3 or 6) of the kept pixels otherwise.
+        '''
+        rays = self.get_rays(depth.shape)
+        depth_buffer = self.depth_buffers[tuple(depth.shape[:2])]
+        s = self.stride
+        depth = depth[::s, ::s]
+        if out is None:
+            out = np.empty(rays.shape[1:] + (6 if rgb is not None else 3, ), dtype = np.float32)
+        # Convert the depth once, then one multiply per coordinate; the interleaved points are filled in blocks of rows
+        # that stay in the cache, instead of one pass over the whole cloud per coordinate.
+        np.copyto(depth_buffer, depth, casting = 'unsafe')
+        if rgb is not None:
+            rgb = rgb[::s, ::s]
+        block = max(_BLOCK_SIZE // (out.shape[1] * out.shape[2] * 4), 1)
+        for begin in range(0, out.shape[0], block):
+            end = begin + block
+            points = out[begin: end]
+            for axis in range(3):
+                np.multiply(rays[axis, begin: end], depth_buffer[begin: end], out = points[..., axis])
+            if rgb is not None:
+                for channel in range(3):
+                    np.multiply(rgb[begin: end, :, channel], np.float32(1.0 / 255), out = points[..., 3 + channel], casting = 'unsafe')
+        if mask is None and not remove_invalid:
+            return out
+        keep = np.ones(depth.shape, dtype = bool) if mask is None else (mask if mask.shape == depth.shape else mask[::s, ::s])
+        if remove_invalid:
+            keep = keep & (depth > 0)
+        return out[keep]
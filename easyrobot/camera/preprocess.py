@@ -0,0 +1,120 @@
+'''
+Frame Preprocessor: crops, downsamples and reorders the channels of camera frames once in the producer,
+so that the consumers of the streams get the frames they use instead of the full frames.
+
+Usage:
+    camera = get_rgbd_camera(name = 'realsense', serial = '...', shm_name = 'camera', preprocess = {'roi': (280, 0, 1000, 720), 'area': 3})
+
+Author: Hongjie Fang.
+'''
+
+import numpy as np
+
+
+class FramePreprocessor(object):
+    '''
+    Frame Preprocessor.
+    '''
+    def __init__(self, roi = None, stride = 1, area = 1, channels = None):
+        '''
+        Initialization.
+
+        Parameters:
+        - roi: (x0, y0, x1, y1), optional, default: None, the region of interest in pixels (x1 and y1 excluded), None means the whole frame;
+        - stride: int, optional, default: 1, the downsampling stride, which keeps one pixel out of stride x stride;
+        - area: int, optional, default: 1, the area downsampling factor, which averages the images over area x area blocks; depth images keep the top-left pixel of every block instead, so that invalid (zero) depth is never mixed with valid depth;
+        - channels: list of int, optional, default: None, the order of the image channels, e.g., [2, 1, 0] for RGB to BGR, None means the original order.
+        '''
+        super(FramePreprocessor, self).__init__()
+        self.roi = None if roi is None else tuple(int(x) for x in roi)
+        self.stride = int(stride)
+        self.area = int(area)
+        self.channels = None if channels is None else list(channels)
+        if self.stride < 1 or self.area < 1 or (self.stride > 1 and self.area > 1):
+            raise AttributeError('Invalid downsampling in frame preprocessor: either stride or area should be used.')
+        self.factor = max(self.stride, self.area)
+        self.buffers = {}
+
+    def get_config(self):
+        '''
+        Get the configuration of the preprocessor, e.g., for the metadata of the streams.
+        '''
+        return {'roi': self.roi, 'stride': self.stride, 'area': self.area, 'channels': self.channels}
+
+    def _crop(self, image):
+        '''
+        Crop the image to the region of interest, trimmed to a multiple of the downsampling factor in area downsampling.
+        '''
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            image = image[y0: y1, x0: x1]
+        if self.area > 1:
+            h, w = image.shape[:2]
+            image = image[: h - h % self.area, : w - w % self.area]
+        return image
+
+    def get_shape(self, shape, depth = False):
+        '''
+        Get the shape of the preprocessed images of the given shape.
+        '''
+        h, w = self._crop(np.empty(shape[:2] + (0, ), dtype = np.uint8)).shape[:2]
+        out_shape = (-(-h // self.factor), -(-w // self.factor))
+        if len(shape) > 2:
+            out_shape = out_shape + (len(self.channels) if self.channels is not None and not depth else shape[2], ) + tuple(shape[3:])
+        return out_shape
+
+    def apply(self, image, out = None, depth = False):
+        '''
+        Preprocess an image.
+
+        Parameters:
+        - image: np.array of shape (H, W) or (H, W, C), required, the image;
+        - out: np.array, optional, default: None, the preallocated array (see `get_shape`) that the preprocessed image is written into, None means a new array;
+        - depth: bool, optional, default: False, whether the image is a depth image, which is never averaged nor reordered.
+
+        Returns:
+        - The preprocessed image.
+        '''
+        if out is None:
+            out = np.empty(self.get_shape(image.shape, depth = depth), dtype = image.dtype)
+        image = self._crop(image)
+        if self.area > 1 and not depth:
+            shape = (image.shape[0] // self.area, image.shape[1] // self.area) + image.shape[2:]
+            if shape not in self.buffers:
+                self.buffers[shape] = np.empty(shape, dtype = np.float32)
+            blocks, image = image, self.buffers[shape]
+            # Sum the area x area strided subimages, which is much faster than a reduction over the blocks.
+            np.copyto(image, blocks[::self.area, ::self.area], casting = 'unsafe')
+            for i in range(self.area):
+                for j in range(self.area):
+                    if i > 0 or j > 0:
+                        np.add(image, blocks[i::self.area, j::self.area], out = image, casting = 'unsafe')
+            image *= np.float32(1.0 / (self.area * self.area))
+            if not np.issubdtype(out.dtype, np.floating):
+                # Round to the nearest integer when converted back.
+                image += np.float32(0.5)
+        elif self.factor > 1:
+            image = image[::self.factor, ::self.factor]
+        if self.channels is not None and not depth and image.ndim > 2:
+            for i, channel in enumerate(self.channels):
+                np.copyto(out[..., i], image[..., channel], casting = 'unsafe')
+        else:
+            np.copyto(out, image, casting = 'unsafe')
+        return out
+
+    def transform_intrinsic(self, intrinsic, depth = False):
+        '''
+        Get the camera intrinsic matrix of the preprocessed images (of the preprocessed depth images if depth is set).
+        '''
+        intrinsic = np.array(intrinsic, dtype = np.float32)
+        if self.roi is not None:
+            intrinsic[0, 2] -= self.roi[0]
+            intrinsic[1, 2] -= self.roi[1]
+        if self.factor > 1:
+            # Centers of the area blocks, or the kept pixels in stride downsampling (and in depth images).
+            offset = 0 if depth else (self.area - 1) / 2
+            intrinsic[0, 2] = (intrinsic[0, 2] - offset) / self.factor
+            intrinsic[1, 2] = (intrinsic[1, 2] - offset) / self.factor
+            intrinsic[0, 0] /= self.factor
+            intrinsic[1, 1] /= self.factor
+        return intrinsic
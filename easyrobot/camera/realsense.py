@@ -4,6 +4,9 @@ RealSense Camera.
 Author: Hongjie Fang, Jirong Liu.
 '''
 
+import time
+import asyncio
+import threading
 import numpy as np
 import pyrealsense2 as rs
 
@@ -21,9 +24,12 @@ class RealSenseRGBDCamera(RGBDCameraBase):
         resolution = (1280, 720),
         enable_emitter = True,
         align = True,
+        background = False,
+        raw_depth = False,
         logger_name: str = "RealSense RGBD Camera",
         shm_name_rgb: str = None, 
         shm_name_depth: str = None,
+        shm_name: str = None,
         streaming_freq: int = 30, 
         **kwargs
     ):
@@ -36,14 +42,19 @@ class RealSenseRGBDCamera(RGBDCameraBase):
         - resolution: (int, int), optional, default: (1280, 720), the resolution of the realsense camera;
         - enable_emitter: bool, optional, default: True, whether to enable the emitter;
         - align: bool, optional, default: True, whether align the frameset with the RGB image;
+        - background: bool, optional, default: False, whether a background thread acquires (and aligns) the framesets, so that the accessors return the latest frameset immediately instead of waiting for the next one;
+        - raw_depth: bool, optional, default: False, whether the depth images are the native np.uint16 depth (in 1 / depth_scale meters, see `easyrobot.utils.transforms.depth.depth_to_meters`) instead of the np.float32 depth in meters;
         - logger_name: str, optional, default: "Camera", the name of the logger;
-        - shm_name: str, optional, default: None, the shared memory name of the camera data, None means no shared memory object;
+        - shm_name_rgb: str, optional, default: None, the shared memory name of the camera RGB data, None means no shared memory object for RGB data;
+        - shm_name_depth: str, optional, default: None, the shared memory name of the camera depth data, None means no shared memory object for depth data;
+        - shm_name: str, optional, default: None, the shared memory name of the camera RGB-D record (the "rgb" and the "depth" fields of the same frame), None means no shared memory object for RGB-D records;
         - streaming_freq: int, optional, default: 30, the streaming frequency.
         '''
         super(RealSenseRGBDCamera, self).__init__()
         self.pipeline = rs.pipeline()
         self.config = rs.config()
         self.serial = serial
+        self.raw_depth = raw_depth
         # =============== Support L515 Camera ============== #
         self.is_radar = str.isalpha(serial[0])
         depth_resolution = (1024, 768) if self.is_radar else resolution
@@ -69,43 +80,184 @@ class RealSenseRGBDCamera(RGBDCameraBase):
         # Get intrinsic
         color_profile = pipeline_profile.get_stream(rs.stream.color) 
         self.intrinsic = color_profile.as_video_stream_profile().get_intrinsics()
+        # Set up background acquisition
+        self.background = background
+        self.frameset = None
+        self.frameset_timestamps = (None, 0)
+        self.frameset_cond = threading.Condition()
+        # The frameset shared by the RGB and the depth accessors, and the images already taken from it.
+        self.paired_frameset = None
+        self.paired_timestamps = (None, 0)
+        self.paired_taken = set()
+        self.paired_lock = threading.Lock()
+        if self.background:
+            self.is_acquiring = True
+            self.acquisition = threading.Thread(target = self.acquiring_thread)
+            self.acquisition.setDaemon(True)
+            self.acquisition.start()
         super(RealSenseRGBDCamera, self).__init__(
             logger_name = logger_name,
             shm_name_rgb = shm_name_rgb,
             shm_name_depth = shm_name_depth,
+            shm_name = shm_name,
             streaming_freq = streaming_freq,
             **kwargs
         )
 
+    def acquiring_thread(self):
+        '''
+        Drain the pipeline, and keep the latest (aligned) frameset along with its timestamps.
+        '''
+        while self.is_acquiring:
+            try:
+                frameset = self.pipeline.wait_for_frames(1000)
+            except RuntimeError:
+                # No frameset within the timeout; check whether the acquisition is stopped.
+                continue
+            timestamps = self._frameset_timestamps(frameset)
+            if self.with_align:
+                frameset = self.align.process(frameset)
+            # Hold the frames beyond the pipeline queue, until a newer frameset replaces them.
+            frameset.keep()
+            with self.frameset_cond:
+                self.frameset = frameset
+                self.frameset_timestamps = timestamps
+                self.frameset_cond.notify_all()
+
+    def _latest_frameset(self, timeout = 5.0):
+        '''
+        Get the latest frameset of the background acquisition, and record its timestamps.
+        '''
+        with self.frameset_cond:
+            if not self.frameset_cond.wait_for(lambda: self.frameset is not None, timeout):
+                raise RuntimeError('Frame didn\'t arrive within {} ms.'.format(int(timeout * 1000)))
+            self.capture_timestamp, self.device_timestamp = self.frameset_timestamps
+            return self.frameset
+
+    def _paired_frameset(self, image):
+        '''
+        Get the frameset of the RGB or the depth image (given by image): a new frameset is taken only if the image has already
+        been taken from the current one, so that `get_rgb_image` and `get_depth_image` called in turn return the images of the same frameset.
+        '''
+        with self.paired_lock:
+            if self.paired_frameset is None or image in self.paired_taken:
+                if self.background:
+                    frameset = self._latest_frameset()
+                else:
+                    frameset = self._align_frameset(self.pipeline.wait_for_frames())
+                    # Hold the frames beyond the pipeline queue, until the other image is taken.
+                    frameset.keep()
+                self.paired_frameset = frameset
+                self.paired_timestamps = (self.capture_timestamp, self.device_timestamp)
+                self.paired_taken = set()
+            self.paired_taken.add(image)
+            self.capture_timestamp, self.device_timestamp = self.paired_timestamps
+            return self.paired_frameset
+
     def get_rgb_image(self):
         '''
-        Get the RGB image from the camera.
+        Get the RGB image from the camera; together with the next `get_depth_image`, the images are of the same frameset (`get_info` gets both at once).
         '''
-        frames = self.pipeline.wait_for_frames()
+        frames = self._paired_frameset('rgb')
         color_frame = frames.get_color_frame()
         color_image = np.asanyarray(color_frame.get_data()).astype(np.uint8)
         return color_image
 
     def get_depth_image(self):
         '''
-        Get the depth image from the camera.
+        Get the depth image (aligned with the RGB image if required) from the camera; together with the next `get_rgb_image`, the images are of the same frameset (`get_info` gets both at once).
         '''
-        frames = self.pipeline.wait_for_frames()
+        frames = self._paired_frameset('depth')
         depth_frame = frames.get_depth_frame()
+        if self.raw_depth:
+            return np.array(depth_frame.get_data(), dtype = np.uint16)
         depth_image = np.asanyarray(depth_frame.get_data()).astype(np.float32) / self.depth_scale
         return depth_image
 
-    def get_info(self):
+    def get_info(self, out = None):
+        '''
+        Get the RGB image along with the depth image (of the same frameset) from the camera.
+
+        Parameters:
+        - out: tuple of (np.array, np.array), optional, default: None, the preallocated RGB (np.uint8) and depth (np.float32, or np.uint16 with raw depth) images that the frames are written into, None means new images.
+        '''
+        if self.background:
+            return self._convert_frameset(self._latest_frameset(), out)
+        return self._process_frameset(self.pipeline.wait_for_frames(), out)
+
+    async def async_get_info(self, out = None, poll_interval = 0.001):
+        '''
+        Get the RGB image along with the depth image from the camera without blocking the event loop:
+        the pipeline is polled for new framesets, and the alignment and the conversion run in the executor of the camera.
+
+        Parameters:
+        - out: tuple of (np.array, np.array), optional, default: None, the preallocated RGB (np.uint8) and depth (np.float32, or np.uint16 with raw depth) images that the frames are written into, None means new images;
+        - poll_interval: float, optional, default: 0.001, the interval (in seconds) between two polls of the pipeline.
+        '''
+        if self.background:
+            return await self._run_in_executor(self.get_info, out)
+        while True:
+            frameset = self.pipeline.poll_for_frames()
+            if frameset.size() > 0:
+                break
+            await asyncio.sleep(poll_interval)
+        return await self._run_in_executor(self._process_frameset, frameset, out)
+
+    def _process_frameset(self, frameset, out = None):
+        '''
+        Align the frameset (if required), and convert it into the RGB image and the depth image.
         '''
-        Get the RGB image along with the depth image from the camera.
+        return self._convert_frameset(self._align_frameset(frameset), out)
+
+    def _align_frameset(self, frameset):
+        '''
+        Record the timestamps of a frameset of the pipeline, and align it (if required).
         '''
-        frameset = self.pipeline.wait_for_frames()
+        self.capture_timestamp, self.device_timestamp = self._frameset_timestamps(frameset)
         if self.with_align:
             frameset = self.align.process(frameset)
-        color_image = np.asanyarray(frameset.get_color_frame().get_data()).astype(np.uint8)
-        depth_image = np.asanyarray(frameset.get_depth_frame().get_data()).astype(np.float32) / self.depth_scale
+        return frameset
+
+    def _convert_frameset(self, frameset, out = None):
+        '''
+        Convert the (aligned) frameset into the RGB image and the depth image.
+        '''
+        color = np.asanyarray(frameset.get_color_frame().get_data())
+        depth = np.asanyarray(frameset.get_depth_frame().get_data())
+        if out is None:
+            if self.raw_depth:
+                return color.astype(np.uint8), depth.astype(np.uint16)
+            return color.astype(np.uint8), depth.astype(np.float32) / self.depth_scale
+        color_image, depth_image = out
+        np.copyto(color_image, color, casting = 'unsafe')
+        if self.raw_depth:
+            np.copyto(depth_image, depth, casting = 'unsafe')
+        else:
+            np.divide(depth, self.depth_scale, out = depth_image)
         return color_image, depth_image
 
+    def _frameset_timestamps(self, frameset):
+        '''
+        Get the capture time of the frameset on the monotonic clock (in ns), and its device timestamp (the frame metadata, in ns).
+        The capture time is derived from the device timestamp if it is in the host clock (global or system time domain),
+        and is the arrival time in background acquisition otherwise (None in foreground acquisition).
+        '''
+        timestamp = frameset.get_timestamp()
+        now = time.monotonic_ns()
+        capture_timestamp = now if self.background else None
+        if frameset.get_frame_timestamp_domain() in [rs.timestamp_domain.global_time, rs.timestamp_domain.system_time]:
+            capture_timestamp = min(now - int((time.time() * 1e3 - timestamp) * 1e6), now)
+        return capture_timestamp, int(timestamp * 1e6)
+
+    def stop(self):
+        '''
+        Stop, together with the background acquisition.
+        '''
+        super(RealSenseRGBDCamera, self).stop()
+        if self.background and self.is_acquiring:
+            self.is_acquiring = False
+            self.acquisition.join()
+
     def get_intrinsic(self, return_mat = True):
         if return_mat:
             return np.array([
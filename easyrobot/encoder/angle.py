@@ -191,6 +191,12 @@ class AngleEncoder(EncoderBase):
         return self.get_angles(ignore_error = ignore_error, **kwargs)
 
 
+    def get_info_fields(self):
+        """
+        Get the names of the entries of the encoder results.
+        """
+        return ['angle_{}'.format(id) for id in self.ids]
+
     def fetch_info(self):
         if not self.is_streaming:
             self.get_info(ignore_error = True)
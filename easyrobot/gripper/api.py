@@ -5,6 +5,7 @@ Author: Hongjie Fang.
 '''
 
 import re
+from easyrobot.utils.worker import DeviceProcess
 from easyrobot.gripper.base import GripperBase
 from easyrobot.gripper.virtual import VirtualGripper
 from easyrobot.gripper.robotiq import Robotiq2FGripper
@@ -14,7 +15,10 @@ from easyrobot.gripper.dahuan import DahuanAG95Gripper
 def get_gripper(**params):
     '''
     Get the gripper object from the gripper library.
+    If "process" is set in the parameters, the gripper is built and runs in its own worker process, and a proxy of the gripper is returned.
     '''
+    if params.pop('process', False):
+        return DeviceProcess(get_gripper, params, logger_name = '{} Process'.format(params.get('logger_name', 'Gripper')))
     name = params.get('name', None)
     if name is not None:
         del params['name']
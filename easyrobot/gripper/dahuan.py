@@ -98,10 +98,13 @@ class DahuanAG95Gripper(GripperBase):
         '''
         self.set_width(0)
 
-    def get_info(self):
+    def get_info(self, out = None):
         '''
         Get the current gripper information, including width, current, status and last command.
 
+        Parameters:
+        - out: np.array, optional, default: None, the preallocated array (of 6 entries) that the information is written into, None means a new np.int64 array.
+
         Returns:
         - width: the width of the gripper, from 0 to 1000;
         - current: the current value of the gripper;
@@ -115,4 +118,14 @@ class DahuanAG95Gripper(GripperBase):
         width = self.master.execute(1, cst.READ_HOLDING_REGISTERS, 0x0202, 1)[0]
         current = self.master.execute(1, cst.READ_HOLDING_REGISTERS, 0x0204, 1)[0]
         status = self.master.execute(1, cst.READ_HOLDING_REGISTERS, 0x0201, 1)[0]
-        return np.array([width[0], current[0], status[0], self.last_position, self.last_force, self.last_timestamp]).astype(np.int64)
+        values = (width[0], current[0], status[0], self.last_position, self.last_force, self.last_timestamp)
+        if out is None:
+            return np.array(values).astype(np.int64)
+        out[:] = values
+        return out
+
+    def get_info_fields(self):
+        '''
+        Get the names of the entries of the gripper information.
+        '''
+        return ['width', 'current', 'status', 'last_position', 'last_force', 'last_timestamp']
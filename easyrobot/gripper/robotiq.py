@@ -138,10 +138,13 @@ class Robotiq2FGripper(GripperBase):
         data = command + crc
         self.ser.write((data))
 
-    def get_info(self):
+    def get_info(self, out = None):
         '''
         Get the current information about the gripper (position, force, status, last command).
         Refer to: page 66-67, 69-70 of ref [1].
+
+        Parameters:
+        - out: np.array, optional, default: None, the preallocated array (of 7 entries) that the information is written into, None means a new np.int64 array.
         
         Returns:
         - position: the position of the gripper, from 0 to 255.
@@ -165,7 +168,7 @@ class Robotiq2FGripper(GripperBase):
                 continue
             # Check error flag. Only allow "no fault" and "minor fault: no communication".
             if data[5] != 0x00 and data[5] != 0x09:
-                return np.array([data[7], data[8], -1, self.last_position, self.last_force, self.last_speed, self.last_timestamp]).astype(np.int64)
+                return _fill(out, (data[7], data[8], -1, self.last_position, self.last_force, self.last_speed, self.last_timestamp))
             # Complete Flag.
             if data[3] == 0xF9 or data[3] == 0xB9 or data[3] == 0x79:
                 completed = True
@@ -180,7 +183,13 @@ class Robotiq2FGripper(GripperBase):
             else:
                 g_status = False
             status = (1 - int(completed)) * 2 + (int(g_status))
-            return np.array([data[7], data[8], status, self.last_position, self.last_force, self.last_speed, self.last_timestamp]).astype(np.int64)
+            return _fill(out, (data[7], data[8], status, self.last_position, self.last_force, self.last_speed, self.last_timestamp))
+
+    def get_info_fields(self):
+        '''
+        Get the names of the entries of the gripper information.
+        '''
+        return ['position', 'force', 'status', 'last_position', 'last_force', 'last_speed', 'last_timestamp']
 
     def _calc_crc(self, command):
         '''
@@ -204,3 +213,10 @@ class Robotiq2FGripper(GripperBase):
             crc_registor = tmp
         crc = bytearray(struct.pack('<H', crc_registor))
         return crc
+
+
+def _fill(out, values):
+    if out is None:
+        return np.array(values).astype(np.int64)
+    out[:] = values
+    return out
@@ -36,11 +36,17 @@ class VirtualGripper(GripperBase):
             **kwargs
         )
     
-    def get_info(self):
+    def get_info(self, out = None):
         '''
         Get the gripper information.
+
+        Parameters:
+        - out: np.array, optional, default: None, the preallocated array that the information is copied into, None means the information itself.
         '''
-        return self.info
+        if out is None:
+            return self.info
+        np.copyto(out, self.info, casting = 'unsafe')
+        return out
 
     def set_info(self, info):
         '''
@@ -4,16 +4,15 @@ Pedal Base Interface.
 Author: Hongjie Fang.
 '''
 
-import time
 import logging
-import threading
 import numpy as np
 
 from easyrobot.utils.logger import ColoredLogger
+from easyrobot.utils.streaming import StreamingBase
 from easyrobot.utils.shared_memory import SharedMemoryManager
 
 
-class PedalBase(object):
+class PedalBase(StreamingBase):
     def __init__(
         self, 
         logger_name: str = "Pedal",
@@ -44,44 +43,13 @@ class PedalBase(object):
         '''
         if self.with_streaming:
             info = np.array(self.get_info()).astype(np.float32)
-            self.shm_pedal = SharedMemoryManager(self.shm_name, 0, info.shape, info.dtype)
+            self.shm_pedal = SharedMemoryManager(self.shm_name, 0, info.shape, info.dtype, versioned = True, fields = self.get_info_fields(), rate = self.streaming_freq, notify = True)
+            self.streaming_buffer = np.empty_like(info)
             self.shm_pedal.execute(info)
 
-    def streaming(self, delay_time = 0.0):
-        '''
-        Start streaming.
-        
-        Parameters:
-        - delay_time: float, optional, default: 0.0, the delay time before collecting data.
-        '''
-        if self.with_streaming is False:
-            raise AttributeError('If you want to use streaming function, the "shm_name" attribute should be set correctly.')
-        self.thread = threading.Thread(target = self.streaming_thread, kwargs = {'delay_time': delay_time})
-        self.thread.setDaemon(True)
-        self.thread.start()
+    def _publish(self, data, timestamp = None, device_timestamp = 0):
+        self.shm_pedal.execute(data, timestamp = timestamp, device_timestamp = device_timestamp)
     
-    def streaming_thread(self, delay_time = 0.0):
-        time.sleep(delay_time)
-        self.is_streaming = True
-        self.logger.info('Start streaming ...')
-        while self.is_streaming:
-            self.shm_pedal.execute(np.array(self.get_info()).astype(np.float32))
-            time.sleep(1.0 / self.streaming_freq)
-    
-    def stop_streaming(self, permanent = True):
-        '''
-        Stop streaming process.
-
-        Parameters:
-        - permanent: bool, optional, default: True, whether the streaming process is stopped permanently.
-        '''
-        self.is_streaming = False
-        self.thread.join()
-        self.logger.info('Close streaming.')
-        if permanent:
-            self._close_shm()
-            self.with_streaming = False
-        
     def _close_shm(self):
         '''
         Close shared memory objects.
@@ -89,11 +57,20 @@ class PedalBase(object):
         if self.with_streaming:
             self.shm_pedal.close()
     
-    def get_info(self):
+    def get_info(self, out = None):
         '''
         Get the pedal information.
+
+        Parameters:
+        - out: np.array, optional, default: None, the preallocated array that the information is written into, None means a new array.
+        '''
+        return np.array([]) if out is None else out
+
+    def get_info_fields(self):
+        '''
+        Get the names of the entries of the pedal information, None means unnamed entries.
         '''
-        return np.array([])
+        return None
     
     def action(self, *args, **kwargs):
         '''
@@ -5,6 +5,7 @@ Author: Hongjie Fang.
 '''
 
 import re
+from easyrobot.utils.worker import DeviceProcess
 from easyrobot.robot.base import RobotBase
 from easyrobot.robot.flexiv import FlexivRobot
 from easyrobot.robot.virtual import VirtualRobot
@@ -13,7 +14,10 @@ from easyrobot.robot.virtual import VirtualRobot
 def get_robot(**params):
     '''
     Get the robot object from the robot library.
+    If "process" is set in the parameters, the robot is built and runs in its own worker process, and a proxy of the robot is returned.
     '''
+    if params.pop('process', False):
+        return DeviceProcess(get_robot, params, logger_name = '{} Process'.format(params.get('logger_name', 'Robot')))
     name = params.get('name', None)
     if name is not None:
         del params['name']
@@ -4,17 +4,17 @@ Robot Base Interface.
 Author: Hongjie Fang.
 '''
 
-import time
+import asyncio
 import logging
-import threading
 import numpy as np
 
 from easyrobot.gripper.api import get_gripper
 from easyrobot.utils.logger import ColoredLogger
+from easyrobot.utils.streaming import StreamingBase
 from easyrobot.utils.shared_memory import SharedMemoryManager
 
 
-class RobotBase(object):
+class RobotBase(StreamingBase):
     def __init__(
         self, 
         gripper: dict = {},
@@ -48,47 +48,55 @@ class RobotBase(object):
         '''
         if self.with_streaming:
             info = np.array(self.get_info()).astype(np.float32)
-            self.shm_robot = SharedMemoryManager(self.shm_name, 0, info.shape, info.dtype)
+            self.shm_robot = SharedMemoryManager(self.shm_name, 0, info.shape, info.dtype, versioned = True, fields = self.get_info_fields(), rate = self.streaming_freq, notify = True)
+            self.streaming_buffer = np.empty_like(info)
             self.shm_robot.execute(info)
         
-    def streaming(self, delay_time = 0.0):
+    def streaming(self, delay_time = 0.0, overrun = 'skip', scheduler = None, priority = 0):
         '''
-        Start streaming.
+        Start streaming, together with the gripper streaming.
         
         Parameters:
-        - delay_time: float, optional, default: 0.0, the delay time before collecting data.
+        - delay_time: float, optional, default: 0.0, the delay time before collecting data;
+        - overrun: str in ['skip', 'catch_up'], optional, default: 'skip', the policy when publishing a sample takes longer than the streaming period (see `RateScheduler`);
+        - scheduler: StreamingScheduler, optional, default: None, the shared scheduler that drives the robot and the gripper streams, None means dedicated streaming threads;
+        - priority: int, optional, default: 0, only used with a shared scheduler, the priority of the robot and the gripper streams.
         '''
-        if self.with_streaming is False:
-            raise AttributeError('If you want to use streaming function, the "shm_name" attribute should be set correctly.')
-        self.thread = threading.Thread(target = self.streaming_thread, kwargs = {'delay_time': delay_time})
-        self.thread.setDaemon(True)
-        self.thread.start()
+        super(RobotBase, self).streaming(delay_time = delay_time, overrun = overrun, scheduler = scheduler, priority = priority)
         try:
-            self.gripper.streaming()
+            self.gripper.streaming(scheduler = scheduler, priority = priority)
         except Exception:
             pass
     
-    def streaming_thread(self, delay_time = 0.0):
-        time.sleep(delay_time)
-        self.is_streaming = True
-        self.logger.info('Start streaming ...')
-        while self.is_streaming:
-            self.shm_robot.execute((self.get_info()).astype(np.float32))
-            time.sleep(1.0 / self.streaming_freq)
+    async def async_streaming(self, delay_time = 0.0, overrun = 'skip'):
+        '''
+        Stream in the running event loop, together with the gripper streaming (see `StreamingBase.async_streaming`).
+        '''
+        if self.gripper.with_streaming:
+            self.gripper_streaming_task = asyncio.ensure_future(self.gripper.async_streaming(delay_time = delay_time, overrun = overrun))
+        await super(RobotBase, self).async_streaming(delay_time = delay_time, overrun = overrun)
+
+    async def async_stop_streaming(self, permanent = True):
+        '''
+        Stop streaming process, together with the gripper streaming, without blocking the event loop.
+        '''
+        await super(RobotBase, self).async_stop_streaming(permanent = permanent)
+        task = getattr(self, 'gripper_streaming_task', None)
+        if task is not None:
+            await task
+            self.gripper_streaming_task = None
+
+    def _publish(self, data, timestamp = None, device_timestamp = 0):
+        self.shm_robot.execute(data, timestamp = timestamp, device_timestamp = device_timestamp)
     
     def stop_streaming(self, permanent = True):
         '''
-        Stop streaming process.
+        Stop streaming process, together with the gripper streaming.
 
         Parameters:
         - permanent: bool, optional, default: True, whether the streaming process is stopped permanently.
         '''
-        self.is_streaming = False
-        self.thread.join()
-        self.logger.info('Close streaming.')
-        if permanent:
-            self._close_shm()
-            self.with_streaming = False
+        super(RobotBase, self).stop_streaming(permanent = permanent)
         try:
             self.gripper.stop_streaming(permanent = permanent)
         except Exception:
@@ -101,11 +109,20 @@ class RobotBase(object):
         if self.with_streaming:
             self.shm_robot.close()
 
-    def get_info(self):
+    def get_info(self, out = None):
         '''
         Get the robot information.
+
+        Parameters:
+        - out: np.array, optional, default: None, the preallocated array that the information is written into, None means a new array.
+        '''
+        return np.array([]) if out is None else out
+
+    def get_info_fields(self):
+        '''
+        Get the names of the entries of the robot information, None means unnamed entries.
         '''
-        return np.array([])
+        return None
 
     def send_tcp_pose(self, pose, wait = False, **kwargs):
         '''
@@ -311,22 +311,42 @@ class FlexivRobot(RobotBase):
                 return
             time.sleep(waiting_time)
 
-    def get_info(self):
+    def get_info(self, out = None):
         '''
         Get the full information, including.
         - joint position and velocity;
         - tcp pose and velocity;
         - force torque in the base/tcp frame.
+
+        Parameters:
+        - out: np.array, optional, default: None, the preallocated array (of 39 entries) that the information is written into, None means a new np.float32 array.
         '''
         state = self.get_robot_states()
-        return np.concatenate([
-            state.q.copy(),               # 0:7 joint pos
-            state.dq.copy(),              # 7:14 joint vel
-            state.tcpPose.copy(),         # 14:21 tcp pose
-            state.tcpVel.copy(),          # 21:27 tcp vel
-            state.extWrenchInTcp.copy(),  # 27:33 wrench in tcp
-            state.extWrenchInBase.copy()  # 33:39 wrench in base
-        ]).astype(np.float32)
+        if out is None:
+            out = np.empty(2 * self.DOF + 25, dtype = np.float32)
+        offset = 0
+        for values in (
+            state.q,                # 0:7 joint pos
+            state.dq,               # 7:14 joint vel
+            state.tcpPose,          # 14:21 tcp pose
+            state.tcpVel,           # 21:27 tcp vel
+            state.extWrenchInTcp,   # 27:33 wrench in tcp
+            state.extWrenchInBase   # 33:39 wrench in base
+        ):
+            out[offset: offset + len(values)] = values
+            offset += len(values)
+        return out
+
+    def get_info_fields(self):
+        '''
+        Get the names of the entries of the full information.
+        '''
+        return ['joint_pos_{}'.format(i) for i in range(self.DOF)] + \
+            ['joint_vel_{}'.format(i) for i in range(self.DOF)] + \
+            ['tcp_pose_{}'.format(c) for c in ['x', 'y', 'z', 'rw', 'rx', 'ry', 'rz']] + \
+            ['tcp_vel_{}'.format(c) for c in ['x', 'y', 'z', 'rx', 'ry', 'rz']] + \
+            ['wrench_tcp_{}'.format(c) for c in ['fx', 'fy', 'fz', 'tx', 'ty', 'tz']] + \
+            ['wrench_base_{}'.format(c) for c in ['fx', 'fy', 'fz', 'tx', 'ty', 'tz']]
 
     def stop(self):
         super(FlexivRobot, self).stop()
@@ -39,11 +39,17 @@ class VirtualRobot(RobotBase):
             **kwargs
         )
     
-    def get_info(self):
+    def get_info(self, out = None):
         '''
         Get the robot information.
+
+        Parameters:
+        - out: np.array, optional, default: None, the preallocated array that the information is copied into, None means the information itself.
         '''
-        return self.info
+        if out is None:
+            return self.info
+        np.copyto(out, self.info, casting = 'unsafe')
+        return out
 
     def set_info(self, info):
         '''
@@ -45,11 +45,14 @@ class FTSensorBase(SensorBase):
         Get the torque sensor information.
         '''
 
-    def get_info(self):
+    def get_info(self, out = None):
         '''
         Get the force/torque sensor information.
+
+        Parameters:
+        - out: np.array, optional, default: None, the preallocated array that the information is written into, None means a new array.
         '''
-        return np.array([])
+        return np.array([]) if out is None else out
 
     def action(self, *args, **kwargs):
         '''
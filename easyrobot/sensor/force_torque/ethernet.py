@@ -11,6 +11,7 @@ Ref:
 
 import socket
 import struct
+import asyncio
 import numpy as np
 
 from easyrobot.sensor.force_torque.base import FTSensorBase
@@ -48,13 +49,21 @@ class EthernetFTSensor(FTSensorBase):
         self.shm_name = shm_name
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.socket.connect((self.ip, self.port))
-        self.logger.info("Connected.")
+        # Non-blocking socket of the asyncio interface, so that its responses never mix with the blocking ones.
+        self.async_socket = None
+        # Preallocated single-measurement request and response buffers (one per socket, so that concurrent reads never share one).
+        self.measure_request = struct.pack('!HHI', 0x1234, 0x0002, 1)
+        self.recv_buf = bytearray(1024)
+        self.async_recv_buf = bytearray(1024)
+        # The most recent measurement (see `fetch_info`), kept apart from the arrays handed out to the callers.
+        self.data = np.zeros((6, )).astype(np.float32)
         super(EthernetFTSensor, self).__init__(
             logger_name = logger_name,
             shm_name = shm_name,
             streaming_freq = streaming_freq,
             **kwargs
         )
+        self.logger.info("Connected.")
     
     def send(self, command, data):
         '''
@@ -68,17 +77,29 @@ class EthernetFTSensor(FTSensorBase):
         msg = struct.pack('!HHI', header, command, data)
         self.socket.send(msg)
     
-    def receive(self):
+    def receive(self, out = None):
         '''
         Receive and unpack the response from the sensor.
+
+        Parameters:
+        - out: np.array, optional, default: None, the preallocated array (of 6 entries) that the values are written into, None means a new np.float32 array.
         
         Returns:
         - np.array of float: The force and torque values received. The first three values are the forces recorded, and the last three are the measured torques.
         '''
-        msg = self.socket.recv(1024)
-        data = np.array(struct.unpack('!IIIiiiiii', msg)[3:]).astype(np.float32)
-        self.data = data / self.scale - self.mean
-        return self.data
+        self.socket.recv_into(self.recv_buf)
+        return self._unpack(self.recv_buf, out)
+
+    def _unpack(self, msg, out = None):
+        values = struct.unpack_from('!IIIiiiiii', msg)[3:]
+        if out is None:
+            out = np.array(values).astype(np.float32)
+        else:
+            out[:] = values
+        np.divide(out, self.scale, out = out)
+        np.subtract(out, self.mean, out = out)
+        np.copyto(self.data, out)
+        return out
     
     def measure(self, n):
         '''
@@ -89,15 +110,43 @@ class EthernetFTSensor(FTSensorBase):
         '''
         self.send(0x0002, n)
     
-    def get_info(self):
+    def get_info(self, out = None):
         '''
         Get a single measurement from the sensor and return it. If the sensor is currently streaming, started by running `startStreaming`, then this function will simply return the most recently returned value.
+
+        Parameters:
+        - out: np.array, optional, default: None, the preallocated array (of 6 entries) that the values are written into, None means a new np.float32 array.
         
         Returns:
         - np.array of float: The force and torque values received. The first three values are the forces recorded, and the last three are the measured torques.
         '''
-        self.measure(n = 1)
-        return self.receive()
+        self.socket.send(self.measure_request)
+        return self.receive(out)
+
+    async def async_get_info(self, out = None):
+        '''
+        Get a single measurement from the sensor over a non-blocking UDP socket, without blocking the event loop.
+
+        Parameters:
+        - out: np.array, optional, default: None, the preallocated array (of 6 entries) that the values are written into, None means a new np.float32 array.
+
+        Returns:
+        - np.array of float: The force and torque values received. The first three values are the forces recorded, and the last three are the measured torques.
+        '''
+        loop = asyncio.get_running_loop()
+        if self.async_socket is None:
+            self.async_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.async_socket.setblocking(False)
+            self.async_socket.connect((self.ip, self.port))
+        await loop.sock_sendall(self.async_socket, self.measure_request)
+        await loop.sock_recv_into(self.async_socket, self.async_recv_buf)
+        return self._unpack(self.async_recv_buf, out)
+
+    def get_info_fields(self):
+        '''
+        Get the names of the entries of the force/torque sensor information.
+        '''
+        return ['fx', 'fy', 'fz', 'tx', 'ty', 'tz']
 
     def get_force(self):
         '''
@@ -122,9 +171,9 @@ class EthernetFTSensor(FTSensorBase):
         Fetch the most recent force/torque measurement.
         
         Returns:
-        - np.array of float: The force and torque values received. The first three values are the forces recorded, and the last three are the measured torques.
+        - np.array of float: The force and torque values received (a copy). The first three values are the forces recorded, and the last three are the measured torques.
         '''
-        return self.data
+        return self.data.copy()
     
     def fetch_force(self):
         '''
@@ -0,0 +1,369 @@
+"""
+Shared Memory Bridge: mirrors named shared memory segments to a remote host over TCP.
+
+The server runs on the host of the producers, attaches to the given (versioned) segments, and
+sends their new samples (all of them for ring buffers, the latest ones otherwise) to the connected client. The client creates local segments with the same
+names (and the same metadata) and publishes the received samples into them, so that consumers on
+the remote host use them as local streams. The new samples of all segments are batched into one
+message per polling round, and both sides reuse preallocated buffers.
+
+Usage (e.g., over loopback):
+    python -m easyrobot.utils.bridge server --names robot camera --port 6060
+    python -m easyrobot.utils.bridge client --host 127.0.0.1 --port 6060 --prefix remote_
+
+Author: Hongjie Fang
+"""
+
+import json
+import time
+import socket
+import struct
+import logging
+import argparse
+import threading
+import collections
+import numpy as np
+
+from easyrobot.utils.logger import ColoredLogger
+from easyrobot.utils.shared_memory import SharedMemoryManager, _dtype_from_meta
+
+
+# Message: header (magic, number of entries, payload size, wall-clock send time in ns),
+# then the entries (segment id, sample index, sample age at sending in ns, device timestamp in ns, payload offset, payload size),
+# then the payloads.
+_MAGIC = b'ERBF'
+_HEADER = struct.Struct('<4sIqq')
+_ENTRY = struct.Struct('<qqqqqq')
+_PAYLOAD_ALIGNMENT = 8
+_META_KEYS = ['layout', 'shape', 'dtype', 'slots', 'triple_buffer', 'fields', 'rate', 'notify']
+
+
+class SharedMemoryBridgeServer(object):
+    """
+    Shared Memory Bridge Server, running on the host of the producers.
+    """
+    def __init__(
+        self,
+        names,
+        host = '0.0.0.0',
+        port = 6060,
+        poll_interval = 0.0005,
+        logger_name: str = "Shared Memory Bridge Server"
+    ):
+        """
+        Initialization.
+
+        Parameters:
+        - names: list of str, required, the names of the versioned shared memory segments to be mirrored;
+        - host: str, optional, default: '0.0.0.0', the address to listen on;
+        - port: int, optional, default: 6060, the port to listen on;
+        - poll_interval: float, optional, default: 0.0005, the interval (in seconds) between two polling rounds of the segments;
+        - logger_name: str, optional, default: "Shared Memory Bridge Server", the name of the logger.
+        """
+        super(SharedMemoryBridgeServer, self).__init__()
+        logging.setLoggerClass(ColoredLogger)
+        self.logger = logging.getLogger(logger_name)
+        self.names = list(names)
+        self.host = host
+        self.port = port
+        self.poll_interval = poll_interval
+        self.segments = [SharedMemoryManager(name, 1, versioned = True) for name in self.names]
+        # A round sends up to all the slots of every ring buffer.
+        self.max_entries = sum(segment.slots for segment in self.segments)
+        max_size = _HEADER.size + _ENTRY.size * self.max_entries
+        for segment in self.segments:
+            max_size += _align(segment.sample_size) * segment.slots
+        self.send_buf = bytearray(max_size)
+        self.last_index = [-1] * len(self.segments)
+        self.is_running = False
+        self.stats = _BridgeStats()
+
+    def start(self):
+        '''
+        Start serving in a background thread.
+        '''
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((self.host, self.port))
+        self.listener.listen(1)
+        self.listener.settimeout(0.5)
+        self.is_running = True
+        self.thread = threading.Thread(target = self.serving_thread)
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def serving_thread(self):
+        self.logger.info('Serving {} on {}:{} ...'.format(self.names, self.host, self.port))
+        while self.is_running:
+            try:
+                conn, addr = self.listener.accept()
+            except socket.timeout:
+                continue
+            self.logger.info('Client {} connected.'.format(addr))
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            try:
+                self._handshake(conn)
+                self.last_index = [-1] * len(self.segments)
+                while self.is_running:
+                    if not self._send_round(conn):
+                        time.sleep(self.poll_interval)
+            except (ConnectionError, OSError):
+                self.logger.warning('Client {} disconnected.'.format(addr))
+            finally:
+                conn.close()
+
+    def _handshake(self, conn):
+        handshake = json.dumps({'segments': [{'name': name, 'meta': segment.meta} for name, segment in zip(self.names, self.segments)]}).encode('utf-8')
+        conn.sendall(struct.pack('<q', len(handshake)) + handshake)
+
+    def _send_round(self, conn):
+        '''
+        Send the new samples of all segments in one message; return whether anything was sent.
+        '''
+        count = 0
+        # The payload area starts after the entry slots of all segments, so that no payload is moved.
+        payload_start = _align(_HEADER.size + _ENTRY.size * self.max_entries)
+        offset = payload_start
+        for i, segment in enumerate(self.segments):
+            if segment.get_status()['index'] == self.last_index[i]:
+                continue
+            if segment.slots > 1:
+                # Ring buffers keep the samples published since the last round, so that none of them is lost.
+                values, info = segment.read_since(self.last_index[i] + 1, return_info = True)
+                for value, index, timestamp, device_timestamp in zip(values, info['index'], info['timestamp'], info['device_timestamp']):
+                    np.copyto(np.ndarray(segment.shape, dtype = segment.dtype, buffer = self.send_buf, offset = offset), value)
+                    offset = self._pack_entry(count, i, int(index), int(timestamp), int(device_timestamp), offset, payload_start)
+                    count += 1
+            else:
+                out = np.ndarray(segment.shape, dtype = segment.dtype, buffer = self.send_buf, offset = offset)
+                _, info = segment.read_into(out, return_info = True)
+                offset = self._pack_entry(count, i, info['index'], info['timestamp'], info['device_timestamp'], offset, payload_start)
+                count += 1
+        if count == 0:
+            return False
+        total = offset
+        _HEADER.pack_into(self.send_buf, 0, _MAGIC, count, total - _HEADER.size, time.time_ns())
+        conn.sendall(memoryview(self.send_buf)[:total])
+        self.stats.update(total, count)
+        return True
+
+    def _pack_entry(self, count, i, index, timestamp, device_timestamp, offset, payload_start):
+        '''
+        Pack the entry of a sample of the i-th segment written at offset; return the offset of the next payload.
+        '''
+        self.last_index[i] = index
+        age = time.monotonic_ns() - timestamp
+        _ENTRY.pack_into(self.send_buf, _HEADER.size + _ENTRY.size * count, i, index, age, device_timestamp, offset - payload_start, self.segments[i].sample_size)
+        return offset + _align(self.segments[i].sample_size)
+
+    def get_stats(self):
+        '''
+        Get the bridge statistics: sent messages and samples per second, and throughput (in MB/s).
+        '''
+        return self.stats.summary()
+
+    def stop(self):
+        '''
+        Stop serving.
+        '''
+        self.is_running = False
+        self.thread.join()
+        self.listener.close()
+        for segment in self.segments:
+            segment.close()
+        self.logger.info('Stop serving.')
+
+
+class SharedMemoryBridgeClient(object):
+    """
+    Shared Memory Bridge Client, running on the host of the consumers.
+    """
+    def __init__(
+        self,
+        host,
+        port = 6060,
+        prefix = '',
+        logger_name: str = "Shared Memory Bridge Client"
+    ):
+        """
+        Initialization.
+
+        Parameters:
+        - host: str, required, the address of the bridge server;
+        - port: int, optional, default: 6060, the port of the bridge server;
+        - prefix: str, optional, default: '', the prefix added to the names of the local segments (e.g., to bridge over loopback);
+        - logger_name: str, optional, default: "Shared Memory Bridge Client", the name of the logger.
+
+        The latency statistics compare the wall clocks of the two hosts, which should be synchronized (e.g., by PTP or NTP).
+        """
+        super(SharedMemoryBridgeClient, self).__init__()
+        logging.setLoggerClass(ColoredLogger)
+        self.logger = logging.getLogger(logger_name)
+        self.host = host
+        self.port = port
+        self.prefix = prefix
+        self.is_running = False
+        self.stats = _BridgeStats()
+
+    def start(self):
+        '''
+        Connect to the server, create the local segments, and start receiving in a background thread.
+        '''
+        self.conn = socket.create_connection((self.host, self.port))
+        self.conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        handshake_size = struct.unpack('<q', _recv_exactly(self.conn, bytearray(8)))[0]
+        handshake = json.loads(bytes(_recv_exactly(self.conn, bytearray(handshake_size))).decode('utf-8'))
+        self.segments = []
+        self.max_entries = sum(segment['meta']['slots'] for segment in handshake['segments'])
+        max_size = _ENTRY.size * self.max_entries
+        for segment in handshake['segments']:
+            meta = segment['meta']
+            sender = SharedMemoryManager(
+                self.prefix + segment['name'],
+                0,
+                meta['shape'],
+                _dtype_from_meta(meta['dtype']),
+                versioned = True,
+                slots = meta['slots'],
+                fields = meta['fields'],
+                rate = meta['rate'],
+                meta = {key: value for key, value in meta.items() if key not in _META_KEYS},
+                notify = meta.get('notify', False),
+                triple_buffer = meta.get('triple_buffer', False)
+            )
+            self.segments.append(sender)
+            max_size += _align(sender.sample_size) * sender.slots
+        self.recv_buf = bytearray(_align(_HEADER.size + max_size))
+        self.header_buf = bytearray(_HEADER.size)
+        self.is_running = True
+        self.thread = threading.Thread(target = self.receiving_thread)
+        self.thread.setDaemon(True)
+        self.thread.start()
+        self.logger.info('Connected to {}:{}, mirroring {}.'.format(self.host, self.port, [self.prefix + s['name'] for s in handshake['segments']]))
+
+    def receiving_thread(self):
+        recv_view = memoryview(self.recv_buf)
+        while self.is_running:
+            try:
+                _recv_exactly(self.conn, self.header_buf)
+                magic, count, size, send_time = _HEADER.unpack(self.header_buf)
+                if magic != _MAGIC:
+                    raise ConnectionError('Invalid message from the bridge server.')
+                _recv_exactly(self.conn, recv_view[:size])
+            except (ConnectionError, OSError):
+                if self.is_running:
+                    self.logger.warning('Disconnected from the bridge server.')
+                self.is_running = False
+                break
+            now = time.monotonic_ns()
+            latency = time.time_ns() - send_time
+            payload_start = _align(_HEADER.size + _ENTRY.size * self.max_entries) - _HEADER.size
+            for k in range(count):
+                i, index, age, device_timestamp, offset, nbytes = _ENTRY.unpack_from(self.recv_buf, _ENTRY.size * k)
+                segment = self.segments[i]
+                # The capture time on the local monotonic clock: the sample age at sending plus the network latency
+                # (the latter is dropped if the wall clocks of the hosts disagree).
+                timestamp = now - age - max(latency, 0)
+                segment.execute(np.ndarray(segment.shape, dtype = segment.dtype, buffer = self.recv_buf, offset = payload_start + offset), timestamp = timestamp, device_timestamp = device_timestamp)
+                self.stats.update_latency(latency, age + latency)
+            self.stats.update(_HEADER.size + size, count)
+
+    def get_stats(self):
+        '''
+        Get the bridge statistics: received messages and samples per second, throughput (in MB/s),
+        network latency and sample age (from capture to local publishing) percentiles (in ms).
+        '''
+        return self.stats.summary()
+
+    def stop(self):
+        '''
+        Stop receiving and remove the local segments.
+        '''
+        self.is_running = False
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.conn.close()
+        self.thread.join()
+        for segment in self.segments:
+            segment.close()
+        self.logger.info('Disconnected.')
+
+
+class _BridgeStats(object):
+    """
+    Rolling bridge statistics.
+    """
+    def __init__(self, window = 1000):
+        self.start_time = time.monotonic()
+        self.messages = 0
+        self.samples = 0
+        self.bytes = 0
+        self.latency = collections.deque(maxlen = window)
+        self.age = collections.deque(maxlen = window)
+
+    def update(self, nbytes, count):
+        self.messages += 1
+        self.samples += count
+        self.bytes += nbytes
+
+    def update_latency(self, latency, age):
+        self.latency.append(latency)
+        self.age.append(age)
+
+    def summary(self):
+        elapsed = max(time.monotonic() - self.start_time, 1e-9)
+        summary = {
+            'messages_per_second': self.messages / elapsed,
+            'samples_per_second': self.samples / elapsed,
+            'throughput_mbps': self.bytes / elapsed / 1e6
+        }
+        if len(self.latency) > 0:
+            latency = np.array(self.latency) / 1e6
+            age = np.array(self.age) / 1e6
+            summary['latency_ms'] = dict(zip(['p50', 'p90', 'p99', 'max'], np.percentile(latency, [50, 90, 99, 100]).tolist()))
+            summary['age_ms'] = dict(zip(['p50', 'p90', 'p99', 'max'], np.percentile(age, [50, 90, 99, 100]).tolist()))
+        return summary
+
+
+def _align(size):
+    return (size + _PAYLOAD_ALIGNMENT - 1) // _PAYLOAD_ALIGNMENT * _PAYLOAD_ALIGNMENT
+
+
+def _recv_exactly(conn, buf):
+    view = memoryview(buf)
+    received = 0
+    while received < len(view):
+        n = conn.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError('Connection closed.')
+        received += n
+    return buf
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Mirror easyrobot shared memory segments over TCP.')
+    parser.add_argument('mode', choices = ['server', 'client'])
+    parser.add_argument('--names', nargs = '+', default = [], help = 'names of the segments to serve')
+    parser.add_argument('--host', default = None)
+    parser.add_argument('--port', type = int, default = 6060)
+    parser.add_argument('--prefix', default = '', help = 'prefix of the local segment names of the client')
+    parser.add_argument('--report', type = float, default = 5.0, help = 'interval (in seconds) of statistics reports')
+    args = parser.parse_args()
+    if args.mode == 'server':
+        bridge = SharedMemoryBridgeServer(args.names, host = args.host or '0.0.0.0', port = args.port)
+    else:
+        bridge = SharedMemoryBridgeClient(args.host or '127.0.0.1', port = args.port, prefix = args.prefix)
+    bridge.start()
+    try:
+        while bridge.is_running:
+            time.sleep(args.report)
+            bridge.logger.info(bridge.get_stats())
+    except KeyboardInterrupt:
+        pass
+    bridge.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""
+Streaming Scheduler: drives the streams of many devices from one loop (or a small worker pool),
+instead of one thread per device.
+
+Usage:
+    scheduler = StreamingScheduler()
+    robot.streaming(scheduler = scheduler, priority = 10)
+    camera.streaming(scheduler = scheduler)
+    scheduler.start()
+
+Author: Hongjie Fang
+"""
+
+import time
+import heapq
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from easyrobot.utils.logger import ColoredLogger
+from easyrobot.utils.streaming import RateScheduler
+
+
+class _Job(object):
+    """
+    A registered stream: the device, its priority and its own fixed-rate schedule.
+    """
+    def __init__(self, device, rate, priority, overrun, delay_ns, order):
+        self.device = device
+        self.priority = priority
+        self.order = order
+        self.delay_ns = delay_ns
+        self.schedule = RateScheduler(rate, overrun = overrun)
+        self.running = False
+        self.active = True
+
+    def align(self, epoch, now):
+        """
+        Start the schedule on the grid of the scheduler epoch, so that the ticks of streams with commensurate rates coincide.
+        """
+        period = self.schedule.period_ns
+        first = max(now + self.delay_ns - epoch, 0)
+        self.schedule.start(epoch + (first + period - 1) // period * period)
+
+    def key(self):
+        # Earlier deadlines first; in the same tick, higher priorities first, then the registration order.
+        return (self.schedule.deadline(), -self.priority, self.order)
+
+
+class StreamingScheduler(object):
+    """
+    Streaming Scheduler.
+    """
+    def __init__(
+        self,
+        workers = 1,
+        logger_name: str = "Streaming Scheduler"
+    ):
+        """
+        Initialization.
+
+        Parameters:
+        - workers: int, optional, default: 1, the number of worker threads; 1 means that all the streams run in the loop of the scheduler, one after another, and more workers let slow devices (e.g., cameras) run alongside the others;
+        - logger_name: str, optional, default: "Streaming Scheduler", the name of the logger.
+        """
+        super(StreamingScheduler, self).__init__()
+        logging.setLoggerClass(ColoredLogger)
+        self.logger = logging.getLogger(logger_name)
+        if workers < 1:
+            raise AttributeError('Invalid number of workers in streaming scheduler.')
+        self.workers = workers
+        self.jobs = {}
+        self.heap = []
+        self.order = 0
+        self.epoch = time.monotonic_ns()
+        self.cond = threading.Condition()
+        self.is_running = False
+        self.executor = None
+
+    def register(self, device, rate = None, priority = 0, overrun = 'skip', delay_time = 0.0):
+        """
+        Register the stream of a device, which publishes one sample per tick through `device._stream_once()`.
+
+        Parameters:
+        - device: the device (a `StreamingBase`);
+        - rate: float, optional, default: None, the streaming rate (in Hz), None means the streaming frequency of the device;
+        - priority: int, optional, default: 0, the priority of the stream; streams due in the same tick run in decreasing priority order;
+        - overrun: str in ['skip', 'catch_up'], optional, default: 'skip', the overrun policy of the stream (see `RateScheduler`);
+        - delay_time: float, optional, default: 0.0, the delay time before the first sample.
+        """
+        with self.cond:
+            if id(device) in self.jobs:
+                raise AttributeError('The device is already registered in the streaming scheduler.')
+            job = _Job(device, device.streaming_freq if rate is None else rate, priority, overrun, int(delay_time * 1e9), self.order)
+            job.align(self.epoch, time.monotonic_ns())
+            device.streaming_scheduler = job.schedule
+            self.order += 1
+            self.jobs[id(device)] = job
+            heapq.heappush(self.heap, (job.key(), job.order, job))
+            self.cond.notify_all()
+
+    def unregister(self, device):
+        """
+        Unregister the stream of a device, and wait until its running sample (if any) is published.
+        """
+        with self.cond:
+            job = self.jobs.pop(id(device), None)
+            if job is None:
+                return
+            job.active = False
+            self.cond.notify_all()
+            while job.running:
+                self.cond.wait()
+
+    def get_stats(self):
+        """
+        Get the overrun statistics of the registered streams, keyed by the shared memory names of the streams
+        (devices of the same class share their logger names).
+        """
+        with self.cond:
+            return {
+                job.device._stats_name(): {
+                    'rate': job.schedule.rate,
+                    'priority': job.priority,
+                    'ticks': job.schedule.tick,
+                    'overruns': job.schedule.overruns,
+                    'skipped': job.schedule.skipped
+                } for job in self.jobs.values()
+            }
+
+    def start(self):
+        """
+        Start the scheduler loop in a background thread.
+        """
+        with self.cond:
+            self.epoch = time.monotonic_ns()
+            self.heap = []
+            for job in self.jobs.values():
+                job.align(self.epoch, self.epoch)
+                heapq.heappush(self.heap, (job.key(), job.order, job))
+            self.is_running = True
+        if self.workers > 1:
+            self.executor = ThreadPoolExecutor(max_workers = self.workers)
+        self.thread = threading.Thread(target = self.scheduling_thread)
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def scheduling_thread(self):
+        self.logger.info('Start scheduling ...')
+        while True:
+            with self.cond:
+                due = self._wait_due()
+                if due is None:
+                    break
+                for job in due:
+                    job.running = True
+            for job in due:
+                if self.executor is None:
+                    self._run(job)
+                else:
+                    self.executor.submit(self._run, job)
+
+    def _wait_due(self):
+        """
+        Wait until some streams are due, and pop them in order; None if the scheduler is stopped.
+        """
+        while self.is_running:
+            while self.heap and not self.heap[0][2].active:
+                heapq.heappop(self.heap)
+            if not self.heap:
+                self.cond.wait(0.1)
+                continue
+            remaining = self.heap[0][0][0] - time.monotonic_ns()
+            if remaining > 0:
+                self.cond.wait(min(remaining, 100000000) / 1e9)
+                continue
+            now = time.monotonic_ns()
+            due = []
+            while self.heap and self.heap[0][0][0] <= now:
+                job = heapq.heappop(self.heap)[2]
+                if job.active:
+                    due.append(job)
+            return due
+        return None
+
+    def _run(self, job):
+        failed = False
+        try:
+            job.device._stream_once()
+        except Exception:
+            self.logger.exception('Stream of {} failed, and is removed from the scheduler.'.format(job.device.logger.name))
+            failed = True
+        with self.cond:
+            job.running = False
+            if failed:
+                job.active = False
+                self.jobs.pop(id(job.device), None)
+            if job.active:
+                job.schedule.advance()
+                heapq.heappush(self.heap, (job.key(), job.order, job))
+            self.cond.notify_all()
+
+    def stop(self):
+        """
+        Stop the scheduler loop; the registered streams stay registered.
+        """
+        with self.cond:
+            self.is_running = False
+            self.cond.notify_all()
+        self.thread.join()
+        if self.executor is not None:
+            self.executor.shutdown(wait = True)
+            self.executor = None
+        self.logger.info('Stop scheduling.')
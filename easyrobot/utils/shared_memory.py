@@ -4,65 +4,750 @@ Shared Memory Manager.
 Author: Hongjie Fang
 """
 
+import os
+import json
+import mmap
+import time
+import ctypes
+import struct
+import platform
 import numpy as np
-from multiprocessing import shared_memory
+
+from easyrobot.utils import shm_registry
+
+
+# Versioned segment layout: a control block of int64 words, the JSON metadata,
+# (the ring timestamps or the buffer control words,) and the array(s), each section aligned to 64 bytes.
+_MAGIC = struct.unpack('<q', b'EZRBSHM1')[0]
+_LAYOUT_VERSION = 2
+_HEADER_SIZE = 64
+_ALIGNMENT = 64
+_WORD_MAGIC = 0
+_WORD_SEQ = 1
+_WORD_TIMESTAMP = 2
+_WORD_INDEX = 3
+_WORD_LAYOUT = 4
+_WORD_META_SIZE = 5
+_WORD_LATEST = 6
+_WORD_DEVICE_TIMESTAMP = 7
+# Per-buffer control words of triple-buffered segments.
+_BUFFER_WORDS = 4
+_BUFFER_SEQ = 0
+_BUFFER_INDEX = 1
+_BUFFER_TIMESTAMP = 2
+_BUFFER_DEVICE_TIMESTAMP = 3
+
+# Futex syscall numbers; other platforms fall back to polling in `wait`.
+_SYS_FUTEX = {'x86_64': 202, 'amd64': 202, 'aarch64': 98, 'arm64': 98}
+_FUTEX_WAIT = 0
+_FUTEX_WAKE = 1
+_POLL_INTERVAL = 0.0005
+
+# Transparent huge pages of shared memory (tmpfs) segments.
+_THP_SHMEM_ENABLED = '/sys/kernel/mm/transparent_hugepage/shmem_enabled'
+_MADV_HUGEPAGE = getattr(mmap, 'MADV_HUGEPAGE', 14)
 
 
 class SharedMemoryManager(object):
     """
     Shared Memory Manager.
     """
-    def __init__(self, name, type = 0, shape = (1,), dtype = np.float32):
+    def __init__(
+        self, 
+        name, 
+        type = 0, 
+        shape = None, 
+        dtype = None, 
+        versioned = False, 
+        slots = 1, 
+        fields = None, 
+        rate = None, 
+        meta = None,
+        notify = False,
+        triple_buffer = False,
+        lock_memory = False,
+        huge_pages = False
+    ):
         """
         Initialization.
-        
+
         Parameters
         ----------
         - name: the name of the shared memory;
         - type: integer in [0, 1];
             * 0: sender;
             * 1: receiver.
-        - shape: optional, default: (1,), the array shape.
-        - dtype: optional, default: np.float32, the element type of the array.
+        - shape: optional, default: None, the array shape, None means (1,) in sender (() for record types) and the published shape in receiver.
+        - dtype: optional, default: None, the element type of the array, None means np.float32 in sender and the published type in receiver; structured types (see `record_dtype`) store several named arrays with their own types in one record.
+        - versioned: optional, default: False, only used in sender, whether the segment starts with a header holding a seqlock counter, the timestamps of the sample (see `execute`), the sample index and the metadata of the segment; receivers then never observe a partially written array. Receivers detect versioned segments automatically, and setting it in receiver requires the segment to be versioned.
+        - slots: optional, default: 1, only used in sender, the number of samples kept in the segment; values larger than 1 turn the segment into a versioned ring buffer, whose history can be read with `read_last` and `read_since`.
+        - fields: optional, default: None, only used in versioned sender, the names of the entries along the last axis of the array.
+        - rate: optional, default: None, only used in versioned sender, the producer rate (in Hz).
+        - meta: optional, default: None, only used in versioned sender, a JSON-serializable dict of extra metadata;
+        - notify: optional, default: False, only used in versioned sender, whether to wake up the receivers blocked in `wait` after every write (through a futex on the seqlock counter);
+        - triple_buffer: optional, default: False, only used in sender, whether the segment is a versioned triple buffer: the sender always fills a buffer that no receiver is reading and publishes it by flipping the latest buffer index, and receivers always get the newest complete sample, so that neither side waits for the other (useful for large samples such as camera frames).
+        - lock_memory: optional, default: False, whether to pre-fault all the pages of the segment and lock them in memory (mlock), so that no write or read takes a page fault or waits for swapped-out pages; locking may need a larger RLIMIT_MEMLOCK (ulimit -l) or CAP_IPC_LOCK.
+        - huge_pages: optional, default: False, whether to request transparent huge pages for the segment (madvise), which takes effect only if the kernel allows huge pages for shared memory (see /sys/kernel/mm/transparent_hugepage/shmem_enabled) and the segment spans at least one huge page.
+
+        Receivers of versioned segments can be attached by name only; the published metadata is available as `meta`, and the given shape and dtype (if any) are checked against it.
+
+        Whether the memory options actually took effect is reported in `memory_status`.
         """
         super(SharedMemoryManager, self).__init__()
         self.name = name
         self.type = type
-        self.shape = shape
-        if isinstance(dtype, str):
-            dtype = to_dtype(dtype)
-        self.dtype = np.dtype(dtype)
         if self.type not in [0, 1]:
             raise AttributeError('Invalid type in shared memory manager.')
+        if isinstance(dtype, str):
+            dtype = to_dtype(dtype)
         if self.type == 0:
-            self.shared_memory = shared_memory.SharedMemory(name = self.name, create = True, size = self.dtype.itemsize * np.prod(self.shape))
-            self.buf = np.ndarray(self.shape, dtype = self.dtype, buffer = self.shared_memory.buf)
+            self.dtype = np.dtype(np.float32 if dtype is None else dtype)
+            if shape is None:
+                shape = (1,) if self.dtype.fields is None else ()
+            self.shape = tuple(shape)
+            self.slots = int(slots)
+            self.triple_buffer = triple_buffer
+            self.versioned = versioned or self.slots > 1 or self.triple_buffer
+            self.notify = notify and self.versioned and _futex_available()
+            if self.slots < 1:
+                raise AttributeError('Invalid number of slots in shared memory manager.')
+            if self.slots > 1 and self.triple_buffer:
+                raise AttributeError('Ring buffer and triple buffer cannot be used together in shared memory manager.')
+            self.meta = {
+                'layout': _LAYOUT_VERSION,
+                'shape': list(self.shape),
+                'dtype': self.dtype.str if self.dtype.fields is None else self.dtype.descr,
+                'slots': self.slots,
+                'triple_buffer': self.triple_buffer,
+                'fields': list(fields) if fields is not None else (list(self.dtype.names) if self.dtype.names else None),
+                'rate': rate,
+                'notify': self.notify
+            }
+            if meta is not None:
+                self.meta.update(meta)
+            meta_bytes = json.dumps(self.meta).encode('utf-8') if self.versioned else b''
+            self._compute_layout(len(meta_bytes))
+            self.shared_memory, reused = shm_registry.create(self.name, self.size)
+            if reused and not self._is_compatible(meta_bytes):
+                shm_registry.release(self.name)
+                self.shared_memory, reused = shm_registry.create(self.name, self.size)
         else:
-            self.shared_memory = shared_memory.SharedMemory(name = self.name)
-        
-    def execute(self, arr = None):
+            self.shared_memory = shm_registry.attach(self.name)
+            self.versioned = self._is_versioned()
+            if versioned and not self.versioned:
+                raise AttributeError('Shared memory segment {} is not versioned.'.format(self.name))
+            if self.versioned:
+                ctrl = np.ndarray((_HEADER_SIZE // 8,), dtype = np.int64, buffer = self.shared_memory.buf)
+                if ctrl[_WORD_LAYOUT] != _LAYOUT_VERSION:
+                    raise AttributeError('Unsupported layout version {} of shared memory segment {}.'.format(ctrl[_WORD_LAYOUT], self.name))
+                meta_size = int(ctrl[_WORD_META_SIZE])
+                self.meta = json.loads(bytes(self.shared_memory.buf[_HEADER_SIZE: _HEADER_SIZE + meta_size]).decode('utf-8'))
+                del ctrl
+                self.shape = tuple(self.meta['shape'])
+                self.dtype = _dtype_from_meta(self.meta['dtype'])
+                self.slots = self.meta['slots']
+                self.triple_buffer = self.meta.get('triple_buffer', False)
+                self.notify = self.meta.get('notify', False)
+                if shape is not None and tuple(shape) != self.shape:
+                    raise AttributeError('Shape mismatch in shared memory receiver: {} expected, {} published.'.format(tuple(shape), self.shape))
+                if dtype is not None and np.dtype(dtype) != self.dtype:
+                    raise AttributeError('Type mismatch in shared memory receiver: {} expected, {} published.'.format(np.dtype(dtype), self.dtype))
+            else:
+                self.meta = None
+                self.notify = False
+                self.shape = (1,) if shape is None else tuple(shape)
+                self.dtype = np.dtype(np.float32 if dtype is None else dtype)
+                self.slots = 1
+                self.triple_buffer = False
+                meta_size = 0
+            self._compute_layout(meta_size)
+            if self.shared_memory.size < self.size:
+                raise AttributeError('Size mismatch in shared memory receiver.')
+        buf = self.shared_memory.buf
+        if self.slots > 1:
+            self.ring = np.ndarray((2 * self.capacity,) + self.shape, dtype = self.dtype, buffer = buf, offset = self.data_offset)
+            self.ring_timestamps = np.ndarray((2 * self.capacity,), dtype = np.int64, buffer = buf, offset = self.table_offset)
+            self.ring_device_timestamps = np.ndarray((2 * self.capacity,), dtype = np.int64, buffer = buf, offset = self.table_offset + 16 * self.capacity)
+            self.data = self.ring
+        elif self.triple_buffer:
+            self.buffers = np.ndarray((3,) + self.shape, dtype = self.dtype, buffer = buf, offset = self.data_offset)
+            self.buffer_ctrl = np.ndarray((3, _BUFFER_WORDS), dtype = np.int64, buffer = buf, offset = self.table_offset)
+            self.data = self.buffers
+            # Views of the buffers handed out by `back_buffer`, and the buffer being filled in place (if any).
+            self.buffer_views = [self.buffers[i] for i in range(3)]
+            self.pending_buffer = None
+        else:
+            self.buf = np.ndarray(self.shape, dtype = self.dtype, buffer = buf, offset = self.data_offset)
+            self.data = self.buf
+        if self.type == 1:
+            # Read-only alias of the mapped data handed out by `view`.
+            self.data = self.data.view()
+            self.data.flags.writeable = False
+        if self.versioned:
+            self.ctrl = np.ndarray((_HEADER_SIZE // 8,), dtype = np.int64, buffer = buf)
+            # The futex word is the lower half of the (little-endian) seqlock counter.
+            self.futex_address = self.ctrl.ctypes.data + 8 * _WORD_SEQ
+            if self.type == 0 and reused:
+                # Continue the sample numbering of the stale owner, so that attached receivers keep working.
+                self.ctrl[_WORD_SEQ] = (int(self.ctrl[_WORD_SEQ]) + 1) // 2 * 2
+                if self.triple_buffer:
+                    self.buffer_ctrl[:, _BUFFER_SEQ] = (self.buffer_ctrl[:, _BUFFER_SEQ] + 1) // 2 * 2
+            elif self.type == 0:
+                buf[_HEADER_SIZE: _HEADER_SIZE + len(meta_bytes)] = meta_bytes
+                self.ctrl[:] = 0
+                self.ctrl[_WORD_INDEX] = -1
+                if self.triple_buffer:
+                    self.buffer_ctrl[:] = 0
+                    self.buffer_ctrl[:, _BUFFER_INDEX] = -1
+                self.ctrl[_WORD_LAYOUT] = _LAYOUT_VERSION
+                self.ctrl[_WORD_META_SIZE] = len(meta_bytes)
+                # The magic word is written last, so that receivers never attach to a half-initialized header.
+                self.ctrl[_WORD_MAGIC] = _MAGIC
+        self.memory_status = self._prepare_memory(lock_memory, huge_pages)
+
+    def _prepare_memory(self, lock_memory, huge_pages):
+        """
+        Apply the memory options to the mapped segment, and report which of them took effect.
+
+        Returns
+        -------
+        - A dict with the "prefaulted", the "locked" and the "huge_pages" flags, and the reasons of the options that did not take effect in "errors".
+        """
+        status = {'prefaulted': False, 'locked': False, 'huge_pages': False, 'errors': {}}
+        if not (lock_memory or huge_pages):
+            return status
+        mapped = self.shared_memory._mmap
+        address = np.frombuffer(self.shared_memory.buf, dtype = np.uint8).ctypes.data
+        size = len(mapped)
+        if huge_pages:
+            # Huge pages must be requested before the pages are faulted in.
+            try:
+                mapped.madvise(_MADV_HUGEPAGE)
+            except (AttributeError, OSError) as e:
+                status['errors']['huge_pages'] = 'madvise failed: {}'.format(e)
+        if lock_memory:
+            pages = np.frombuffer(self.shared_memory.buf, dtype = np.uint8)[::mmap.PAGESIZE]
+            if self.type == 0:
+                # Write faults allocate the pages; the values are kept, since the receivers may already read them.
+                pages[:] = pages
+            else:
+                # Receivers never write into the segment, so that their pages are faulted in by reads only.
+                int(pages.sum(dtype = np.int64))
+            status['prefaulted'] = True
+            libc = _libc()
+            if libc is None:
+                status['errors']['locked'] = 'mlock is not available on this platform'
+            elif libc.mlock(ctypes.c_void_p(address), ctypes.c_size_t(size)) == 0:
+                status['locked'] = True
+            else:
+                status['errors']['locked'] = 'mlock failed: {}'.format(os.strerror(ctypes.get_errno()))
+        if huge_pages and 'huge_pages' not in status['errors']:
+            status['huge_pages'] = _huge_pages_mapped(address)
+            if not status['huge_pages']:
+                status['errors']['huge_pages'] = 'no huge page is mapped (shmem_enabled: {}, segment size: {})'.format(_thp_shmem_mode(), size)
+        return status
+
+    def _compute_layout(self, meta_size):
+        """
+        Compute the offsets of the segment sections and the segment size.
+        """
+        # The ring keeps one spare slot so that a full window stays readable while the next sample is written,
+        # and every sample is stored twice (mirrored) so that any window is contiguous in memory.
+        if self.triple_buffer:
+            self.capacity, mirror = 3, 1
+        else:
+            self.capacity = self.slots + 1 if self.slots > 1 else 1
+            mirror = 2 if self.slots > 1 else 1
+        offset = _align(_HEADER_SIZE + meta_size) if self.versioned else 0
+        self.table_offset = offset
+        if self.slots > 1:
+            # The capture timestamps, then the device timestamps of the slots.
+            offset = _align(offset + 2 * 8 * mirror * self.capacity)
+        elif self.triple_buffer:
+            offset = _align(offset + 8 * _BUFFER_WORDS * self.capacity)
+        self.data_offset = offset
+        self.sample_size = self.dtype.itemsize * int(np.prod(self.shape))
+        self.size = max(offset + self.sample_size * mirror * self.capacity, 1)
+
+    def _is_compatible(self, meta_bytes):
+        """
+        Check whether a reused stale segment has the same layout as the one to be created.
+        """
+        if not self.versioned:
+            return not self._is_versioned()
+        if not self._is_versioned():
+            return False
+        ctrl = struct.unpack_from('<8q', self.shared_memory.buf, 0)
+        old_meta_bytes = bytes(self.shared_memory.buf[_HEADER_SIZE: _HEADER_SIZE + ctrl[_WORD_META_SIZE]])
+        return ctrl[_WORD_LAYOUT] == _LAYOUT_VERSION and old_meta_bytes == meta_bytes
+
+    def _is_versioned(self):
+        """
+        Check whether the attached segment starts with the versioned header.
+        """
+        if self.shared_memory.size < _HEADER_SIZE:
+            return False
+        return struct.unpack_from('<q', self.shared_memory.buf, 0)[0] == _MAGIC
+
+    def execute(self, arr = None, return_info = False, timestamp = None, device_timestamp = 0):
         """
         Execute the function.
 
         Paramters
         ---------
-        - arr: np.array object, only used in sender, the array.
+        - arr: np.array object, only used in sender, the array; for record (structured) types, a dict mapping field names to arrays is also accepted.
+        - return_info: bool, optional, default: False, only used in versioned receiver, whether to also return a dict with the "index", the "timestamp" and the "device_timestamp" of the received sample.
+        - timestamp: int, optional, default: None, only used in versioned sender, the monotonic capture time (in ns) of the sample, None means the write time.
+        - device_timestamp: int, optional, default: 0, only used in versioned sender, the device-native timestamp (in ns, in the clock of the device) of the sample, 0 means unavailable.
         """
         if self.type == 0:
             if arr is None:
                 raise AttributeError('Array should be specified in shared memory sender.')
             try:
-                self.buf[:] = arr[:]
+                if self.versioned:
+                    self._write(arr, timestamp, device_timestamp)
+                elif isinstance(arr, dict):
+                    _assign(self.buf, arr)
+                else:
+                    self.buf[:] = arr[:]
             except Exception:
                 raise AttributeError('Size mismatch in shared memory receiver.')
         else:
-            ret_arr = np.copy(np.ndarray(self.shape, dtype = self.dtype, buffer = self.shared_memory.buf))
-            return ret_arr
+            return self.read_into(np.empty(self.shape, dtype = self.dtype), return_info = return_info)
+
+    def read_into(self, out, return_info = False):
+        """
+        Copy the latest sample into a preallocated array, only used in receiver.
+
+        Parameters
+        ----------
+        - out: np.array object of the segment shape, the destination array;
+        - return_info: bool, optional, default: False, only used in versioned receiver, whether to also return a dict with the "index", the "timestamp" and the "device_timestamp" of the received sample.
+
+        Returns
+        -------
+        - The destination array.
+        """
+        if self.type != 1:
+            raise AttributeError('Reading is only available in shared memory receiver.')
+        if not self.versioned:
+            if return_info:
+                raise AttributeError('Sample information is only available in versioned shared memory.')
+            np.copyto(out, self.buf)
+            return out
+        if self.slots > 1:
+            ret_arr, info = self._read_window(count = 1, out = out)
+        elif self.triple_buffer:
+            info = self._read_latest_buffer(out)
+        else:
+            info = self._read(out)
+        if return_info:
+            return out, {'index': info['index'], 'timestamp': info['timestamp'], 'device_timestamp': info['device_timestamp']}
+        return out
+
+    def view(self, count = None):
+        """
+        Get a read-only view of the latest sample(s) without copying, only used in versioned receiver.
+        The view aliases the mapped segment and thus changes when the sender overwrites it; call
+        `is_valid` with the returned information after using the view to confirm it was not modified.
+
+        Parameters
+        ----------
+        - count: int, optional, default: None, only used in ring buffer, the maximum number of latest samples in the view; None means the latest sample only.
+
+        Returns
+        -------
+        - The read-only view, of the segment shape, or of shape (n, *shape) if count is given;
+        - A dict with the "index", the "timestamp", the "device_timestamp" and the seqlock "seq" (and the "buffer" in triple buffer) of the viewed sample(s).
+        """
+        if self.type != 1 or not self.versioned:
+            raise AttributeError('Views are only available in versioned shared memory receiver.')
+        if self.slots > 1:
+            arr, info = self._read_window(count = 1 if count is None else count, copy = False)
+            if count is None:
+                if len(arr) == 0:
+                    arr = self.data[0]
+                    info.update({'index': -1, 'timestamp': 0, 'device_timestamp': 0})
+                else:
+                    arr = arr[0]
+                    info.update({'index': int(info['index'][0]), 'timestamp': int(info['timestamp'][0]), 'device_timestamp': int(info['device_timestamp'][0])})
+            return arr, info
+        if count is not None:
+            raise AttributeError('Sample count is only available in ring buffer.')
+        if self.triple_buffer:
+            info = self._read_latest_buffer(None)
+            return self.data[info['buffer']], info
+        return self.data, self._read(None)
+
+    def is_valid(self, info):
+        """
+        Check whether the samples described by the information returned by `view` are still intact, only used in versioned receiver.
+        """
+        if self.triple_buffer:
+            return int(self.buffer_ctrl[info['buffer'], _BUFFER_SEQ]) == info['seq']
+        started = (int(self.ctrl[_WORD_SEQ]) - info['seq'] + 1) // 2
+        return np.size(info['index']) + started <= self.capacity
+
+    def wait(self, index = None, timeout = None):
+        """
+        Block until the sender publishes a sample newer than the given index, only used in versioned receiver.
+        Without sender notification (see `notify`), the segment is polled instead.
+
+        Parameters
+        ----------
+        - index: int, optional, default: None, the index of the last known sample, None means the latest published sample;
+        - timeout: float, optional, default: None, the maximum waiting time (in seconds), None means waiting forever.
+
+        Returns
+        -------
+        - Whether a newer sample is available, False means timeout.
+        """
+        if self.type != 1 or not self.versioned:
+            raise AttributeError('Waiting is only available in versioned shared memory receiver.')
+        if index is None:
+            index = int(self.ctrl[_WORD_INDEX])
+        deadline = None if timeout is None else time.monotonic() + timeout
+        notified = self.notify and _futex_available()
+        while True:
+            seq = int(self.ctrl[_WORD_SEQ])
+            if int(self.ctrl[_WORD_INDEX]) > index:
+                return True
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            if not notified:
+                time.sleep(_POLL_INTERVAL if remaining is None else min(_POLL_INTERVAL, remaining))
+                continue
+            # Returns immediately if the counter already changed, and on wake-up / timeout / interruption.
+            _futex(self.futex_address, _FUTEX_WAIT, seq, remaining)
+
+    def read_last(self, count, return_info = False):
+        """
+        Read the latest samples of a ring buffer, only used in receiver.
+
+        Parameters
+        ----------
+        - count: int, the maximum number of samples to read, at most the number of slots;
+        - return_info: bool, optional, default: False, whether to also return a dict with the "index", the "timestamp" and the "device_timestamp" arrays of the samples.
+
+        Returns
+        -------
+        - A contiguous array of shape (n, *shape) holding the samples in chronological order, where n <= count.
+        """
+        ret_arr, info = self._read_window(count = count)
+        if return_info:
+            return ret_arr, {'index': info['index'], 'timestamp': info['timestamp'], 'device_timestamp': info['device_timestamp']}
+        return ret_arr
+
+    def read_since(self, index, return_info = False):
+        """
+        Read all the samples of a ring buffer whose index is no less than the given index, only used in receiver.
+        Samples that have already been overwritten are skipped, which can be detected from the returned indices.
+
+        Parameters
+        ----------
+        - index: int, the index of the first requested sample;
+        - return_info: bool, optional, default: False, whether to also return a dict with the "index", the "timestamp" and the "device_timestamp" arrays of the samples.
+
+        Returns
+        -------
+        - A contiguous array of shape (n, *shape) holding the samples in chronological order.
+        """
+        ret_arr, info = self._read_window(since = index)
+        if return_info:
+            return ret_arr, {'index': info['index'], 'timestamp': info['timestamp'], 'device_timestamp': info['device_timestamp']}
+        return ret_arr
+
+    def _write(self, arr, timestamp = None, device_timestamp = 0):
+        """
+        Seqlock write: the counter is odd while the array is being modified.
+        """
+        if self.triple_buffer:
+            return self._write_back_buffer(arr, timestamp, device_timestamp)
+        seq = int(self.ctrl[_WORD_SEQ])
+        index = int(self.ctrl[_WORD_INDEX]) + 1
+        self.ctrl[_WORD_SEQ] = seq + 1
+        try:
+            if timestamp is None:
+                timestamp = time.monotonic_ns()
+            if self.slots > 1:
+                slot = index % self.capacity
+                _assign(self.ring[slot], arr)
+                _assign(self.ring[slot + self.capacity], arr)
+                self.ring_timestamps[slot] = timestamp
+                self.ring_timestamps[slot + self.capacity] = timestamp
+                self.ring_device_timestamps[slot] = device_timestamp
+                self.ring_device_timestamps[slot + self.capacity] = device_timestamp
+            else:
+                _assign(self.buf, arr)
+            self.ctrl[_WORD_TIMESTAMP] = timestamp
+            self.ctrl[_WORD_DEVICE_TIMESTAMP] = device_timestamp
+            self.ctrl[_WORD_INDEX] = index
+        finally:
+            # Always leave the critical section, so that a failed write never blocks the receivers.
+            self.ctrl[_WORD_SEQ] = seq + 2
+        if self.notify:
+            _futex(self.futex_address, _FUTEX_WAKE, 0x7FFFFFFF)
+
+    def _write_back_buffer(self, arr, timestamp = None, device_timestamp = 0):
+        """
+        Triple buffer write: fill the buffer after the latest one (never the latest one, which receivers
+        are reading), then publish it by flipping the latest buffer index.
+        """
+        index = int(self.ctrl[_WORD_INDEX]) + 1
+        if self.pending_buffer is not None:
+            # The buffer has been handed out by `back_buffer`, and is already marked as being written.
+            target = self.pending_buffer
+            self.pending_buffer = None
+            buffer_seq = int(self.buffer_ctrl[target, _BUFFER_SEQ]) - 1
+        else:
+            target = self._back_buffer_index(index)
+            buffer_seq = int(self.buffer_ctrl[target, _BUFFER_SEQ])
+            self.buffer_ctrl[target, _BUFFER_SEQ] = buffer_seq + 1
+        try:
+            if arr is not self.buffer_views[target]:
+                _assign(self.buffers[target], arr)
+            if timestamp is None:
+                timestamp = time.monotonic_ns()
+            self.buffer_ctrl[target, _BUFFER_INDEX] = index
+            self.buffer_ctrl[target, _BUFFER_TIMESTAMP] = timestamp
+            self.buffer_ctrl[target, _BUFFER_DEVICE_TIMESTAMP] = device_timestamp
+        finally:
+            self.buffer_ctrl[target, _BUFFER_SEQ] = buffer_seq + 2
+        seq = int(self.ctrl[_WORD_SEQ])
+        self.ctrl[_WORD_SEQ] = seq + 1
+        self.ctrl[_WORD_LATEST] = target
+        self.ctrl[_WORD_TIMESTAMP] = timestamp
+        self.ctrl[_WORD_DEVICE_TIMESTAMP] = device_timestamp
+        self.ctrl[_WORD_INDEX] = index
+        self.ctrl[_WORD_SEQ] = seq + 2
+        if self.notify:
+            _futex(self.futex_address, _FUTEX_WAKE, 0x7FFFFFFF)
+
+    def _back_buffer_index(self, index):
+        latest = int(self.ctrl[_WORD_LATEST])
+        return (latest + 1) % 3 if index > 0 else latest
+
+    def back_buffer(self):
+        """
+        Get the writable buffer that the next sample is published from, only used in triple-buffered sender.
+        Fill it in place (e.g., by `get_info(out = ...)`) and publish it by `execute` with the same buffer, which then skips the copy.
+        """
+        if self.type != 0 or not self.triple_buffer:
+            raise AttributeError('Back buffers are only available in triple-buffered shared memory sender.')
+        if self.pending_buffer is None:
+            target = self._back_buffer_index(int(self.ctrl[_WORD_INDEX]) + 1)
+            # Mark the buffer as being written, so that a receiver still copying it (two samples behind) retries.
+            self.buffer_ctrl[target, _BUFFER_SEQ] += 1
+            self.pending_buffer = target
+        return self.buffer_views[self.pending_buffer]
+
+    def _read_latest_buffer(self, out):
+        """
+        Triple buffer read: copy the latest buffer into out (if given); the copy is only retried if the
+        sender meanwhile published two newer samples and started overwriting the buffer.
+        """
+        while True:
+            target = int(self.ctrl[_WORD_LATEST])
+            buffer_seq = int(self.buffer_ctrl[target, _BUFFER_SEQ])
+            if buffer_seq & 1:
+                time.sleep(0)
+                continue
+            if out is not None:
+                np.copyto(out, self.buffers[target])
+            index = int(self.buffer_ctrl[target, _BUFFER_INDEX])
+            timestamp = int(self.buffer_ctrl[target, _BUFFER_TIMESTAMP])
+            device_timestamp = int(self.buffer_ctrl[target, _BUFFER_DEVICE_TIMESTAMP])
+            if int(self.buffer_ctrl[target, _BUFFER_SEQ]) == buffer_seq:
+                return {'index': index, 'timestamp': timestamp, 'device_timestamp': device_timestamp, 'seq': buffer_seq, 'buffer': target}
+
+    def _read(self, out):
+        """
+        Seqlock read: copy into out (if given) and retry until no write overlapped the copy.
+        """
+        while True:
+            seq = int(self.ctrl[_WORD_SEQ])
+            if seq & 1:
+                time.sleep(0)
+                continue
+            if out is not None:
+                np.copyto(out, self.buf)
+            index = int(self.ctrl[_WORD_INDEX])
+            timestamp = int(self.ctrl[_WORD_TIMESTAMP])
+            device_timestamp = int(self.ctrl[_WORD_DEVICE_TIMESTAMP])
+            if self.ctrl[_WORD_SEQ] == seq:
+                return {'index': index, 'timestamp': timestamp, 'device_timestamp': device_timestamp, 'seq': seq}
+
+    def _read_window(self, count = None, since = None, copy = True, out = None):
+        """
+        Read a window of consecutive samples from the ring buffer. The window is valid if the
+        writes that started meanwhile did not reach the slots of the window. With count = 1,
+        the latest sample can be copied into out instead; an empty ring leaves out zeroed.
+        """
+        if self.type != 1 or self.slots <= 1:
+            raise AttributeError('History reading is only available in ring buffer receivers.')
+        while True:
+            seq = int(self.ctrl[_WORD_SEQ])
+            if seq & 1:
+                time.sleep(0)
+                continue
+            last = int(self.ctrl[_WORD_INDEX])
+            first = max(last - self.slots + 1, 0)
+            if since is not None:
+                first = max(first, since)
+            if count is not None:
+                first = max(first, last - min(count, self.slots) + 1)
+            num = max(last - first + 1, 0)
+            start = first % self.capacity
+            ret_arr = self.data[start: start + num]
+            if out is not None:
+                if num == 0:
+                    out[...] = 0
+                else:
+                    np.copyto(out, ret_arr[0])
+            elif copy:
+                ret_arr = np.copy(ret_arr)
+            timestamps = np.copy(self.ring_timestamps[start: start + num])
+            device_timestamps = np.copy(self.ring_device_timestamps[start: start + num])
+            started = (int(self.ctrl[_WORD_SEQ]) - seq + 1) // 2
+            if num + started <= self.capacity:
+                break
+        info = {'index': np.arange(first, first + num, dtype = np.int64), 'timestamp': timestamps, 'device_timestamp': device_timestamps, 'seq': seq}
+        if out is not None:
+            info['index'] = first if num else -1
+            info['timestamp'] = int(timestamps[0]) if num else 0
+            info['device_timestamp'] = int(device_timestamps[0]) if num else 0
+        return ret_arr, info
+
+    def get_status(self):
+        """
+        Get the "index", the "timestamp" and the "device_timestamp" of the latest published sample without reading it, only used in versioned shared memory.
+        """
+        if not self.versioned:
+            raise AttributeError('Sample information is only available in versioned shared memory.')
+        return {'index': int(self.ctrl[_WORD_INDEX]), 'timestamp': int(self.ctrl[_WORD_TIMESTAMP]), 'device_timestamp': int(self.ctrl[_WORD_DEVICE_TIMESTAMP])}
 
     def close(self):
-        self.shared_memory.close()
         if self.type == 0:
-            self.shared_memory.unlink()
+            shm_registry.release(self.name)
+        else:
+            self.shared_memory.close()
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+_futex_syscall = []
+
+def _futex_available():
+    """
+    Load the libc syscall function for futex operations once, and check whether it is available.
+    """
+    if not _futex_syscall:
+        syscall = None
+        if platform.system() == 'Linux' and platform.machine().lower() in _SYS_FUTEX:
+            try:
+                syscall = ctypes.CDLL(None, use_errno = True).syscall
+                syscall.restype = ctypes.c_long
+            except (OSError, AttributeError):
+                syscall = None
+        _futex_syscall.append((syscall, _SYS_FUTEX.get(platform.machine().lower())))
+    return _futex_syscall[0][0] is not None
+
+def _futex(address, op, value, timeout = None):
+    """
+    Issue a (process-shared) futex operation on the 32-bit word at the given address.
+    """
+    syscall, number = _futex_syscall[0]
+    timespec = None
+    if timeout is not None:
+        timespec = ctypes.byref(_Timespec(int(timeout), int((timeout % 1) * 1e9)))
+    syscall(number, ctypes.c_void_p(address), op, ctypes.c_uint32(value & 0xFFFFFFFF), timespec, None, 0)
+
+_libc_handle = []
+
+def _libc():
+    """
+    Load the libc (for mlock) once, None if unavailable.
+    """
+    if not _libc_handle:
+        libc = None
+        if os.name == 'posix':
+            try:
+                libc = ctypes.CDLL(None, use_errno = True)
+                libc.mlock.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+            except (OSError, AttributeError):
+                libc = None
+        _libc_handle.append(libc)
+    return _libc_handle[0]
+
+def _thp_shmem_mode():
+    """
+    Get the selected transparent huge page mode of shared memory, None if unavailable.
+    """
+    try:
+        with open(_THP_SHMEM_ENABLED, 'r') as f:
+            modes = f.read().split()
+    except OSError:
+        return None
+    for mode in modes:
+        if mode.startswith('['):
+            return mode.strip('[]')
+    return None
+
+def _huge_pages_mapped(address):
+    """
+    Check whether huge pages back the mapping that starts at the given address (through /proc/self/smaps).
+    """
+    try:
+        with open('/proc/self/smaps', 'r') as f:
+            in_mapping = False
+            for line in f:
+                fields = line.split()
+                if not fields:
+                    continue
+                if '-' in fields[0] and not fields[0].endswith(':'):
+                    start, end = [int(x, 16) for x in fields[0].split('-')]
+                    in_mapping = (start <= address < end)
+                elif in_mapping and fields[0] in ['ShmemPmdMapped:', 'FilePmdMapped:']:
+                    if int(fields[1]) > 0:
+                        return True
+    except (OSError, ValueError, IndexError):
+        return False
+    return False
+
+def record_dtype(arrays):
+    """
+    Build the structured type of a record holding the given arrays.
+
+    Parameters
+    ----------
+    - arrays: dict, mapping field names to sample arrays, whose shapes and element types are kept in the record.
+    """
+    return np.dtype([(name, np.asarray(arr).dtype, np.shape(arr)) for name, arr in arrays.items()])
+
+def _assign(dst, arr):
+    if isinstance(arr, dict):
+        for name, value in arr.items():
+            dst[name] = value
+    else:
+        dst[...] = arr
+
+def _dtype_from_meta(descr):
+    """
+    Rebuild a type from its published description (a type string, or a JSON-decoded structured description).
+    """
+    if isinstance(descr, str):
+        return np.dtype(descr)
+    fields = []
+    for field in descr:
+        name, base = field[0], field[1]
+        if not isinstance(base, str):
+            base = _dtype_from_meta(base)
+        fields.append((name, base) if len(field) == 2 else (name, base, tuple(field[2])))
+    return np.dtype(fields)
+
+def _align(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
 
 def to_dtype(s):
     if s == "bool":
@@ -0,0 +1,219 @@
+"""
+Shared Memory Registry: tracks the owners of the shared memory segments created by easyrobot,
+recovers stale segments left by crashed owners, and cleans up owned segments on exit and on signals.
+
+Author: Hongjie Fang
+"""
+
+import os
+import sys
+import json
+import atexit
+import signal
+import tempfile
+import threading
+from multiprocessing import shared_memory, resource_tracker
+
+
+REGISTRY_DIR = os.environ.get('EASYROBOT_SHM_REGISTRY', os.path.join(tempfile.gettempdir(), 'easyrobot-shm'))
+
+_owned = {}
+_lock = threading.Lock()
+_cleanup_installed = []
+
+
+def _entry_path(name):
+    return os.path.join(REGISTRY_DIR, '{}.json'.format(name))
+
+
+def register(name, size):
+    """
+    Record the current process as the owner of the segment.
+    """
+    os.makedirs(REGISTRY_DIR, exist_ok = True)
+    path = _entry_path(name)
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump({'name': name, 'pid': os.getpid(), 'size': size}, f)
+    os.replace(tmp_path, path)
+
+
+def unregister(name):
+    """
+    Remove the registry entry of the segment, if it is owned by the current process.
+    """
+    entry = lookup(name)
+    if entry is not None and entry['pid'] == os.getpid():
+        try:
+            os.remove(_entry_path(name))
+        except FileNotFoundError:
+            pass
+
+
+def lookup(name):
+    """
+    Get the registry entry (name, owner pid, size) of the segment, None if unregistered.
+    """
+    try:
+        with open(_entry_path(name), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def list_segments():
+    """
+    Get the registry entries of all the registered segments, with an extra "alive" flag of the owner.
+    """
+    if not os.path.isdir(REGISTRY_DIR):
+        return []
+    entries = []
+    for filename in sorted(os.listdir(REGISTRY_DIR)):
+        if not filename.endswith('.json'):
+            continue
+        entry = lookup(filename[:-len('.json')])
+        if entry is not None:
+            entry['alive'] = is_alive(entry['pid'])
+            entries.append(entry)
+    return entries
+
+
+def is_alive(pid):
+    """
+    Check whether the process is still running.
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def create(name, size):
+    """
+    Create the segment for the current process. If a segment of the same name already exists,
+    and its registered owner is another process that is no longer running, the stale segment is recovered.
+
+    Parameters
+    ----------
+    - name: the name of the shared memory;
+    - size: the size of the shared memory.
+
+    Returns
+    -------
+    - The shared memory object;
+    - Whether the segment is a reused stale segment of the same size, whose receivers stay attached.
+    """
+    with _lock:
+        if name in _owned:
+            # Never recover a segment that the current process still owns, e.g., two devices with the same shared memory name.
+            raise FileExistsError('Shared memory segment {} is already owned by the current process.'.format(name))
+    try:
+        shm = _open(name, create = True, size = size)
+        reused = False
+    except FileExistsError:
+        entry = lookup(name)
+        if entry is None:
+            raise FileExistsError('Shared memory segment {} already exists and is not registered by easyrobot; remove it manually if it is stale.'.format(name))
+        if entry['pid'] != os.getpid() and is_alive(entry['pid']):
+            raise FileExistsError('Shared memory segment {} is owned by the running process {}.'.format(name, entry['pid']))
+        shm = _open(name)
+        reused = (shm.size == size)
+        if not reused:
+            shm.close()
+            _unlink(shm)
+            shm = _open(name, create = True, size = size)
+    register(name, size)
+    with _lock:
+        _owned[name] = shm
+    _install_cleanup()
+    return shm, reused
+
+
+def attach(name):
+    """
+    Attach to an existing segment without taking its ownership: unlike the standard library,
+    the segment is not unlinked by the resource tracker when the current process exits.
+    """
+    return _open(name)
+
+
+def _open(name, create = False, size = 0):
+    """
+    Open a segment that is not tracked by the resource tracker of the standard library. The
+    tracker would unlink the segment when the process that opened it exits, even if another
+    process (a receiver, or a new owner after recovery) still uses it; easyrobot cleans up
+    the owned segments on its own instead.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name = name, create = create, size = size, track = False)
+    shm = shared_memory.SharedMemory(name = name, create = create, size = size)
+    if os.name == 'posix':
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+def _unlink(shm):
+    if os.name == 'posix' and sys.version_info < (3, 13):
+        # `unlink` also unregisters the segment from the tracker, which must know the name.
+        resource_tracker.register(shm._name, 'shared_memory')
+    shm.unlink()
+
+
+def release(name):
+    """
+    Close and unlink an owned segment, and remove its registry entry.
+    Forked children inherit the bookkeeping but not the ownership, so they only close the segment.
+    """
+    with _lock:
+        shm = _owned.pop(name, None)
+    if shm is None:
+        return
+    try:
+        shm.close()
+    except BufferError:
+        pass
+    entry = lookup(name)
+    if entry is not None and entry['pid'] != os.getpid():
+        return
+    try:
+        _unlink(shm)
+    except FileNotFoundError:
+        pass
+    unregister(name)
+
+
+def release_all():
+    """
+    Release all the segments owned by the current process.
+    """
+    for name in list(_owned.keys()):
+        release(name)
+
+
+def _install_cleanup():
+    """
+    Release owned segments at exit and on termination signals, then let the previous signal handlers run.
+    """
+    if _cleanup_installed:
+        return
+    _cleanup_installed.append(True)
+    atexit.register(release_all)
+    if threading.current_thread() is not threading.main_thread():
+        return
+    for signum in [signal.SIGTERM, getattr(signal, 'SIGHUP', None)]:
+        if signum is None:
+            continue
+        previous = signal.getsignal(signum)
+
+        def handler(signum, frame, previous = previous):
+            release_all()
+            if callable(previous):
+                previous(signum, frame)
+            elif previous != signal.SIG_IGN:
+                signal.signal(signum, signal.SIG_DFL)
+                os.kill(os.getpid(), signum)
+
+        signal.signal(signum, handler)
@@ -0,0 +1,228 @@
+"""
+Snapshot Service: buffers the recent timestamped samples of several streams, and returns the samples
+of all the streams that correspond to the same instant (nearest or linearly interpolated), with the
+skew of every stream to the requested instant.
+
+Usage:
+    service = SnapshotService(['robot', 'gripper', 'force_torque', 'camera'])
+    service.start()
+    snapshot = service.snapshot(method = 'linear')
+
+Author: Hongjie Fang
+"""
+
+import math
+import logging
+import threading
+import numpy as np
+
+from easyrobot.utils.logger import ColoredLogger
+from easyrobot.utils.shared_memory import SharedMemoryManager
+
+
+class _StreamHistory(object):
+    """
+    Recent samples of one stream. The timestamps are kept in a mirrored buffer (every timestamp is stored twice),
+    so that the buffered window is always contiguous and sorted by time, and can be searched without copies;
+    the values are stored once, with a spare slot that the next sample is read into outside the window.
+    """
+    def __init__(self, name, capacity):
+        self.name = name
+        self.receiver = SharedMemoryManager(name, 1, versioned = True)
+        self.capacity = capacity
+        self.values = np.zeros((capacity + 1, ) + self.receiver.shape, dtype = self.receiver.dtype)
+        self.timestamps = np.zeros(2 * capacity, dtype = np.int64)
+        self.count = 0
+        self.last_index = -1
+        self.lock = threading.Lock()
+
+    def next_value(self):
+        """
+        Get the (0-d for record streams) view of the spare slot, which the next sample is written into.
+        """
+        return self.values[self.count % (self.capacity + 1), ...]
+
+    def commit(self, timestamp):
+        """
+        Add the sample written into the spare slot to the buffered window.
+        """
+        with self.lock:
+            slot = self.count % self.capacity
+            self.timestamps[slot] = timestamp
+            self.timestamps[slot + self.capacity] = timestamp
+            self.count += 1
+
+    def window(self):
+        """
+        Get the (start, end) of the buffered window in the mirrored timestamps, and the number of its first sample.
+        """
+        n = min(self.count, self.capacity)
+        start = (self.count - n) % self.capacity
+        return start, start + n, self.count - n
+
+    def value_slots(self, first, positions):
+        """
+        Get the slots of the values at the given positions of the window starting at the given sample number.
+        """
+        return (first + positions) % (self.capacity + 1)
+
+
+class SnapshotService(object):
+    """
+    Snapshot Service.
+    """
+    def __init__(
+        self,
+        names,
+        window = 1.0,
+        history = None,
+        logger_name: str = "Snapshot Service"
+    ):
+        """
+        Initialization.
+
+        Parameters:
+        - names: list of str, required, the names of the (versioned) shared memory streams;
+        - window: float, optional, default: 1.0, the time span (in seconds) of the buffered samples, computed from the published rates of the streams;
+        - history: int or dict, optional, default: None, the number of buffered samples (of all streams, or per stream name), overriding the window;
+        - logger_name: str, optional, default: "Snapshot Service", the name of the logger.
+        """
+        super(SnapshotService, self).__init__()
+        logging.setLoggerClass(ColoredLogger)
+        self.logger = logging.getLogger(logger_name)
+        self.names = list(names)
+        self.streams = {}
+        for name in self.names:
+            receiver_rate = SharedMemoryManager(name, 1, versioned = True)
+            rate = receiver_rate.meta.get('rate') or 100
+            receiver_rate.close()
+            if isinstance(history, dict) and name in history:
+                capacity = history[name]
+            elif isinstance(history, int):
+                capacity = history
+            else:
+                capacity = int(math.ceil(rate * window)) + 2
+            self.streams[name] = _StreamHistory(name, max(capacity, 2))
+        self.is_running = False
+
+    def start(self):
+        """
+        Start collecting the samples of the streams in background threads.
+        """
+        self.is_running = True
+        self.threads = []
+        for stream in self.streams.values():
+            thread = threading.Thread(target = self.collecting_thread, args = (stream, ))
+            thread.setDaemon(True)
+            thread.start()
+            self.threads.append(thread)
+        self.logger.info('Start collecting {} ...'.format(self.names))
+
+    def collecting_thread(self, stream):
+        try:
+            self._collect(stream)
+        except Exception:
+            self.logger.exception('Collecting stream {} failed.'.format(stream.name))
+
+    def _collect(self, stream):
+        receiver = stream.receiver
+        while self.is_running:
+            if not receiver.wait(stream.last_index, timeout = 0.1):
+                continue
+            if receiver.slots > 1:
+                # Ring buffers keep the samples published meanwhile, so that none of them is missed.
+                values, info = receiver.read_since(stream.last_index + 1, return_info = True)
+                if len(info['index']) == 0:
+                    continue
+                for value, timestamp in zip(values, info['timestamp']):
+                    stream.next_value()[...] = value
+                    stream.commit(timestamp)
+                stream.last_index = int(info['index'][-1])
+            else:
+                # The sample is read straight into the history, once.
+                _, info = receiver.read_into(stream.next_value(), return_info = True)
+                stream.commit(info['timestamp'])
+                stream.last_index = info['index']
+
+    def lookup(self, name, times, method = 'nearest'):
+        """
+        Get the samples of a stream at the given instants (vectorized).
+
+        Parameters:
+        - name: str, required, the name of the stream;
+        - times: int or np.array of int, required, the monotonic instants (in ns);
+        - method: str in ['nearest', 'linear'], optional, default: 'nearest', how the samples are computed:
+            * 'nearest': the buffered samples that are the nearest in time;
+            * 'linear': the linear interpolation of the buffered samples around the instants, clamped to the buffered window; record (structured) streams always use the nearest samples.
+
+        Returns:
+        - values: np.array of shape (len(times), *shape), the samples;
+        - timestamps: np.array of int, the timestamps (in ns) of the nearest buffered samples;
+        - skews: np.array of int, the signed offsets (in ns) of the instants from the nearest buffered samples.
+        """
+        if method not in ['nearest', 'linear']:
+            raise AttributeError('Invalid method in snapshot service.')
+        stream = self.streams[name]
+        times = np.atleast_1d(np.asarray(times, dtype = np.int64))
+        with stream.lock:
+            start, end, first = stream.window()
+            if end == start:
+                raise AttributeError('No sample of stream {} has been collected.'.format(name))
+            timestamps = stream.timestamps[start: end]
+            values = stream.values
+            right = np.clip(np.searchsorted(timestamps, times), 1, len(timestamps) - 1) if len(timestamps) > 1 else np.zeros(len(times), dtype = np.int64)
+            left = np.maximum(right - 1, 0)
+            nearest = np.where(np.abs(times - timestamps[left]) <= np.abs(timestamps[right] - times), left, right)
+            if method == 'nearest' or values.dtype.fields is not None or len(timestamps) == 1:
+                result = values[stream.value_slots(first, nearest)]
+            else:
+                span = (timestamps[right] - timestamps[left]).astype(np.float64)
+                weights = np.clip((times - timestamps[left]) / np.where(span > 0, span, 1.0), 0.0, 1.0)
+                weights = weights.reshape((-1, ) + (1, ) * (values.ndim - 1))
+                left_values = values[stream.value_slots(first, left)]
+                result = left_values + weights * (values[stream.value_slots(first, right)].astype(np.float64) - left_values)
+            nearest_timestamps = timestamps[nearest]
+        return result, nearest_timestamps, times - nearest_timestamps
+
+    def snapshot(self, t = None, method = 'nearest', names = None):
+        """
+        Get the samples of the streams at the same instant.
+
+        Parameters:
+        - t: int, optional, default: None, the monotonic instant (in ns), None means the latest instant that all the streams have reached (the oldest of their latest samples);
+        - method: str in ['nearest', 'linear'], optional, default: 'nearest', see `lookup`;
+        - names: list of str, optional, default: None, the streams of the snapshot, None means all the streams.
+
+        Returns:
+        - A dict mapping the stream names to dicts of the "value", the "timestamp" (of the nearest sample) and the "skew" (in ns);
+          and the instant of the snapshot under the "time" key.
+        """
+        names = self.names if names is None else names
+        if t is None:
+            t = min(self.latest_timestamp(name) for name in names)
+        snapshot = {'time': t}
+        for name in names:
+            values, timestamps, skews = self.lookup(name, t, method = method)
+            snapshot[name] = {'value': values[0], 'timestamp': int(timestamps[0]), 'skew': int(skews[0])}
+        return snapshot
+
+    def latest_timestamp(self, name):
+        """
+        Get the timestamp (in ns) of the latest buffered sample of a stream.
+        """
+        stream = self.streams[name]
+        with stream.lock:
+            if stream.count == 0:
+                raise AttributeError('No sample of stream {} has been collected.'.format(name))
+            return int(stream.timestamps[(stream.count - 1) % stream.capacity])
+
+    def stop(self):
+        """
+        Stop collecting the samples.
+        """
+        self.is_running = False
+        for thread in self.threads:
+            thread.join()
+        for stream in self.streams.values():
+            stream.receiver.close()
+        self.logger.info('Stop collecting.')
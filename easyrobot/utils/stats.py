@@ -0,0 +1,162 @@
+"""
+Stream Statistics: cheap rolling statistics of a stream (achieved rate, jitter, latencies of the streaming stages
+and overruns), exposed through `summary()` and a small shared memory stats block that other processes can read.
+
+Usage (in another process):
+    stats = read_stats('robot')
+
+Author: Hongjie Fang
+"""
+
+import numpy as np
+
+from easyrobot.utils.shared_memory import SharedMemoryManager
+
+
+STAGES = ['get_info', 'serialize', 'publish']
+PERCENTILES = [50, 90, 99]
+# Latency histograms with power-of-two bins in microseconds: bin 0 holds [0, 1) us, and bin k holds [2^(k-1), 2^k) us.
+HISTOGRAM_BINS = 26
+
+STATS_DTYPE = np.dtype([
+    ('samples', np.int64),
+    ('overruns', np.int64),
+    ('skipped', np.int64),
+    ('rate', np.float64),
+    ('target_rate', np.float64),
+    ('jitter_us', np.float64, (len(PERCENTILES), )),
+    ('latency_us', np.float64, (len(STAGES), len(PERCENTILES))),
+    ('histogram', np.int64, (len(STAGES), HISTOGRAM_BINS))
+])
+
+
+def stats_name(shm_name):
+    """
+    Get the name of the stats block of a stream.
+    """
+    return '{}_stats'.format(shm_name)
+
+
+class StreamStats(object):
+    """
+    Rolling statistics of a stream, updated once per sample without allocations.
+    """
+    def __init__(self, rate, window = 1024, shm_name = None, publish_interval = 1.0):
+        """
+        Initialization.
+
+        Parameters:
+        - rate: float, required, the target rate (in Hz) of the stream;
+        - window: int, optional, default: 1024, the number of recent samples of the rolling statistics;
+        - shm_name: str, optional, default: None, the name of the shared memory stats block, None means no stats block;
+        - publish_interval: float, optional, default: 1.0, the interval (in seconds) between two updates of the stats block.
+        """
+        super(StreamStats, self).__init__()
+        self.rate = rate
+        self.period_ns = 1e9 / rate
+        self.window = window
+        self.intervals = np.zeros(window, dtype = np.int64)
+        self.latencies = np.zeros((len(STAGES), window), dtype = np.int64)
+        self.histogram = np.zeros((len(STAGES), HISTOGRAM_BINS), dtype = np.int64)
+        self.samples = 0
+        self.last_start = None
+        self.schedule = None
+        self.publish_interval_ns = int(publish_interval * 1e9)
+        self.last_publish = 0
+        self.shm_stats = None
+        if shm_name is not None:
+            self.shm_stats = SharedMemoryManager(stats_name(shm_name), 0, (), STATS_DTYPE, versioned = True, meta = {'stages': STAGES, 'percentiles': PERCENTILES})
+            self.record = np.zeros((), dtype = STATS_DTYPE)
+
+    def update(self, start, acquired, serialized, published):
+        """
+        Record the monotonic timestamps (in ns) of the streaming stages of one sample: the start of the tick,
+        and the ends of `get_info`, of the serialization and of the shared memory write.
+        """
+        i = self.samples % self.window
+        if self.last_start is not None:
+            self.intervals[(self.samples - 1) % self.window] = start - self.last_start
+        self.last_start = start
+        for stage, (begin, end) in enumerate(((start, acquired), (acquired, serialized), (serialized, published))):
+            latency = end - begin
+            self.latencies[stage, i] = latency
+            self.histogram[stage, min((latency // 1000).bit_length(), HISTOGRAM_BINS - 1)] += 1
+        self.samples += 1
+        if self.shm_stats is not None and published - self.last_publish >= self.publish_interval_ns:
+            self.last_publish = published
+            self._publish()
+
+    def summary(self):
+        """
+        Get the statistics: samples, overruns and skipped ticks of the schedule, achieved and target rates (in Hz),
+        percentiles of the inter-sample jitter (deviation from the period) and of the stage latencies (in us),
+        and the latency histograms (power-of-two bins in us).
+        """
+        n = min(self.samples, self.window)
+        intervals = self.intervals[:max(min(self.samples - 1, self.window), 0)]
+        summary = {
+            'samples': self.samples,
+            'overruns': self.schedule.overruns if self.schedule is not None else 0,
+            'skipped': self.schedule.skipped if self.schedule is not None else 0,
+            'rate': 1e9 / intervals.mean() if len(intervals) > 0 else 0.0,
+            'target_rate': self.rate,
+            'jitter_us': dict(zip(PERCENTILES, (np.percentile(np.abs(intervals - self.period_ns), PERCENTILES) / 1e3).tolist() if len(intervals) > 0 else [0.0] * len(PERCENTILES))),
+            'latency_us': {},
+            'histogram': {}
+        }
+        for stage, name in enumerate(STAGES):
+            latencies = self.latencies[stage, :n]
+            summary['latency_us'][name] = dict(zip(PERCENTILES, (np.percentile(latencies, PERCENTILES) / 1e3).tolist() if n > 0 else [0.0] * len(PERCENTILES)))
+            summary['histogram'][name] = self.histogram[stage].tolist()
+        return summary
+
+    def _publish(self):
+        summary = self.summary()
+        record = self.record
+        for key in ['samples', 'overruns', 'skipped', 'rate', 'target_rate']:
+            record[key] = summary[key]
+        record['jitter_us'] = [summary['jitter_us'][p] for p in PERCENTILES]
+        record['latency_us'] = [[summary['latency_us'][name][p] for p in PERCENTILES] for name in STAGES]
+        record['histogram'] = self.histogram
+        self.shm_stats.execute(record)
+
+    def close(self):
+        """
+        Publish the final statistics, and close the stats block.
+        """
+        if self.shm_stats is not None:
+            self._publish()
+            self.shm_stats.close()
+            self.shm_stats = None
+
+
+def read_stats(shm_name):
+    """
+    Read the statistics of a stream from its shared memory stats block, in the format of `StreamStats.summary()`, with an extra "timestamp" (monotonic, in ns) of the last update.
+
+    Parameters:
+    - shm_name: str, required, the shared memory name of the stream.
+    """
+    receiver = SharedMemoryManager(stats_name(shm_name), 1)
+    try:
+        record, info = receiver.execute(return_info = True)
+    finally:
+        receiver.close()
+    return stats_from_record(record, info['timestamp'])
+
+
+def stats_from_record(record, timestamp):
+    """
+    Convert a record of a stats block into the format of `read_stats`, with the monotonic timestamp (in ns) of the record.
+    """
+    return {
+        'samples': int(record['samples']),
+        'overruns': int(record['overruns']),
+        'skipped': int(record['skipped']),
+        'rate': float(record['rate']),
+        'target_rate': float(record['target_rate']),
+        'jitter_us': dict(zip(PERCENTILES, record['jitter_us'].tolist())),
+        'latency_us': {name: dict(zip(PERCENTILES, record['latency_us'][stage].tolist())) for stage, name in enumerate(STAGES)},
+        'histogram': {name: record['histogram'][stage].tolist() for stage, name in enumerate(STAGES)},
+        'timestamp': timestamp
+    }
@@ -0,0 +1,350 @@
+"""
+Streaming: fixed-rate scheduling and the streaming loop shared by the device bases.
+
+Author: Hongjie Fang
+"""
+
+import time
+import asyncio
+import inspect
+import functools
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from easyrobot.utils.stats import StreamStats
+
+
+class RateScheduler(object):
+    """
+    Fixed-rate scheduler against absolute monotonic deadlines: the n-th tick is due at start + n / rate,
+    so that the time spent between two ticks does not make the rate drift.
+    """
+    def __init__(self, rate, overrun = 'skip', max_catch_up = None):
+        """
+        Initialization.
+
+        Parameters
+        ----------
+        - rate: float, the tick rate (in Hz);
+        - overrun: str in ['skip', 'catch_up'], optional, default: 'skip', the policy when a tick is later than the next deadline:
+            * 'skip': the missed deadlines are dropped, and the next tick is due at the next deadline on the original grid;
+            * 'catch_up': the missed ticks run back-to-back until the schedule is caught up.
+        - max_catch_up: int, optional, default: None, only used in 'catch_up' policy, the maximum number of missed ticks to catch up, None means unlimited; older missed ticks are dropped.
+        """
+        super(RateScheduler, self).__init__()
+        if rate <= 0:
+            raise AttributeError('Invalid rate in rate scheduler.')
+        if overrun not in ['skip', 'catch_up']:
+            raise AttributeError('Invalid overrun policy in rate scheduler.')
+        self.rate = rate
+        self.period_ns = int(round(1e9 / rate))
+        self.overrun = overrun
+        self.max_catch_up = max_catch_up
+        self.start()
+
+    def start(self, now = None):
+        """
+        (Re)start the schedule, with the first tick due immediately.
+        """
+        self.start_ns = time.monotonic_ns() if now is None else now
+        self.tick = 0
+        self.overruns = 0
+        self.skipped = 0
+
+    def deadline(self):
+        """
+        Get the monotonic deadline (in ns) of the next tick.
+        """
+        return self.start_ns + self.tick * self.period_ns
+
+    def wait(self, is_running = None):
+        """
+        Advance the schedule after a tick ran, and wait until the next tick is due.
+
+        Parameters
+        ----------
+        - is_running: callable, optional, default: None, stop waiting early when it returns False (checked at least every 100 ms).
+
+        Returns
+        -------
+        - The number of ticks dropped (in 'skip' policy) or still to be caught up (in 'catch_up' policy) before the next tick.
+        """
+        late = self.advance()
+        deadline = self.deadline()
+        while True:
+            remaining = deadline - time.monotonic_ns()
+            if remaining <= 0 or (is_running is not None and not is_running()):
+                break
+            time.sleep(min(remaining, 100000000) / 1e9)
+        return late
+
+    def advance(self, now = None):
+        """
+        Advance the schedule after a tick ran, without waiting.
+
+        Returns
+        -------
+        - The number of ticks dropped (in 'skip' policy) or still to be caught up (in 'catch_up' policy) before this tick.
+        """
+        deadline = self.deadline()
+        now = time.monotonic_ns() if now is None else now
+        late = (now - deadline) // self.period_ns
+        self.tick += 1
+        if late <= 0:
+            return 0
+        self.overruns += 1
+        if self.overrun == 'skip':
+            self.tick += late
+            self.skipped += late
+            return late
+        if self.max_catch_up is not None and late > self.max_catch_up:
+            self.tick += late - self.max_catch_up
+            self.skipped += late - self.max_catch_up
+            late = self.max_catch_up
+        return late
+
+
+class StreamingBase(object):
+    """
+    Streaming loop of the devices: publishes one sample (see `_publish`) at every tick of a fixed-rate schedule,
+    in a dedicated thread, a shared scheduler or an asyncio event loop; and the asyncio counterparts of the device calls.
+
+    The devices provide the `logger`, `is_streaming`, `with_streaming` and `streaming_freq` attributes, and implement `_publish` and `_close_shm`.
+    Devices with a preallocated `streaming_buffer` (an array, or a tuple of arrays) stream without per-sample allocations:
+    `get_info(out = ...)` fills the buffer in place if the device supports it, and the sample is copied into the buffer otherwise.
+    Every stream keeps rolling statistics (see `get_streaming_stats`), which are also published in the "<shm_name>_stats" shared memory block.
+
+    Every sample is published with its monotonic capture time (in ns): by default, halfway through `get_info`; devices that know
+    when the sample was captured set `capture_timestamp` in `get_info`, and devices with native timestamps set `device_timestamp`.
+    """
+    _streaming_requirement = 'the "shm_name" attribute should be set correctly'
+    # Keyword arguments of `get_info` in the streaming loop.
+    _streaming_info_kwargs = {}
+    # Timestamps (in ns) of the latest sample set by the devices in `get_info`: the monotonic capture time (None means unknown),
+    # and the device-native timestamp (0 means unavailable).
+    capture_timestamp = None
+    device_timestamp = 0
+
+    def streaming(self, delay_time = 0.0, overrun = 'skip', scheduler = None, priority = 0):
+        '''
+        Start streaming.
+
+        Parameters:
+        - delay_time: float, optional, default: 0.0, the delay time before collecting data;
+        - overrun: str in ['skip', 'catch_up'], optional, default: 'skip', the policy when publishing a sample takes longer than the streaming period (see `RateScheduler`);
+        - scheduler: StreamingScheduler, optional, default: None, the shared scheduler that drives the stream, None means a dedicated streaming thread;
+        - priority: int, optional, default: 0, only used with a shared scheduler, the priority of the stream among the streams due in the same tick.
+        '''
+        if self.with_streaming is False:
+            raise AttributeError('If you want to use streaming function, {}.'.format(self._streaming_requirement))
+        self.is_streaming = True
+        self.shared_scheduler = scheduler
+        self.thread = None
+        self._prepare_streaming()
+        if scheduler is not None:
+            scheduler.register(self, priority = priority, overrun = overrun, delay_time = delay_time)
+            self.streaming_stats.schedule = self.streaming_scheduler
+            self.logger.info('Start streaming with the shared scheduler ...')
+            return
+        self.streaming_scheduler = RateScheduler(self.streaming_freq, overrun = overrun)
+        self.streaming_stats.schedule = self.streaming_scheduler
+        self.thread = threading.Thread(target = self.streaming_thread, kwargs = {'delay_time': delay_time})
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def streaming_thread(self, delay_time = 0.0):
+        time.sleep(delay_time)
+        self.logger.info('Start streaming ...')
+        scheduler = self.streaming_scheduler
+        scheduler.start()
+        while self.is_streaming:
+            self._stream_once()
+            scheduler.wait(is_running = lambda: self.is_streaming)
+
+    def stop_streaming(self, permanent = True):
+        '''
+        Stop streaming process.
+
+        Parameters:
+        - permanent: bool, optional, default: True, whether the streaming process is stopped permanently.
+        '''
+        self.is_streaming = False
+        if getattr(self, 'shared_scheduler', None) is not None:
+            self.shared_scheduler.unregister(self)
+            self.shared_scheduler = None
+        elif self.thread is not None:
+            self.thread.join()
+        self.logger.info('Close streaming.')
+        if permanent:
+            self._close_shm()
+            self._close_stats()
+            self.with_streaming = False
+
+    async def async_streaming(self, delay_time = 0.0, overrun = 'skip'):
+        '''
+        Stream in the running event loop until the streaming is stopped, e.g., `asyncio.create_task(device.async_streaming())`.
+        The samples are collected by `async_get_info`, so that many devices stream concurrently in one event loop.
+
+        Parameters:
+        - delay_time: float, optional, default: 0.0, the delay time before collecting data;
+        - overrun: str in ['skip', 'catch_up'], optional, default: 'skip', the policy when publishing a sample takes longer than the streaming period (see `RateScheduler`).
+        '''
+        if self.with_streaming is False:
+            raise AttributeError('If you want to use streaming function, {}.'.format(self._streaming_requirement))
+        self.is_streaming = True
+        self.shared_scheduler = None
+        self.thread = None
+        self.streaming_task = asyncio.current_task()
+        self._prepare_streaming()
+        self.streaming_scheduler = RateScheduler(self.streaming_freq, overrun = overrun)
+        self.streaming_stats.schedule = self.streaming_scheduler
+        await asyncio.sleep(delay_time)
+        self.logger.info('Start streaming in the event loop ...')
+        scheduler = self.streaming_scheduler
+        scheduler.start()
+        while self.is_streaming:
+            start = time.monotonic_ns()
+            self.capture_timestamp, self.device_timestamp = None, 0
+            info = await self.async_get_info(**self._get_info_kwargs())
+            # The streaming (and the shared memory objects) may be closed while waiting for the sample.
+            if not self.is_streaming:
+                break
+            acquired = time.monotonic_ns()
+            timestamp = self._sample_timestamp(start, acquired)
+            data = self._serialize(info)
+            serialized = time.monotonic_ns()
+            self._publish(data, timestamp, self.device_timestamp)
+            self.streaming_stats.update(start, acquired, serialized, time.monotonic_ns())
+            scheduler.advance()
+            await asyncio.sleep(max(scheduler.deadline() - time.monotonic_ns(), 0) / 1e9)
+
+    async def async_stop_streaming(self, permanent = True):
+        '''
+        Stop streaming process, and wait until the streaming loop exits without blocking the event loop.
+
+        Parameters:
+        - permanent: bool, optional, default: True, whether the streaming process is stopped permanently.
+        '''
+        task = getattr(self, 'streaming_task', None)
+        if task is None or task.done() or task is asyncio.current_task():
+            await asyncio.get_running_loop().run_in_executor(None, functools.partial(self.stop_streaming, permanent = permanent))
+            return
+        self.is_streaming = False
+        await task
+        self.streaming_task = None
+        self.stop_streaming(permanent = permanent)
+
+    async def async_get_info(self, **kwargs):
+        '''
+        Get the device information without blocking the event loop; by default, `get_info` runs in the executor of the device.
+        '''
+        return await self._run_in_executor(self.get_info, **kwargs)
+
+    async def async_action(self, *args, **kwargs):
+        '''
+        Unified device action without blocking the event loop; by default, `action` runs in the executor of the device.
+        '''
+        return await self._run_in_executor(self.action, *args, **kwargs)
+
+    async def _run_in_executor(self, func, *args, **kwargs):
+        '''
+        Run a blocking call in the single-thread executor of the device, which keeps the calls to one device (e.g., on one serial port) in order.
+        '''
+        if getattr(self, 'async_executor', None) is None:
+            self.async_executor = ThreadPoolExecutor(max_workers = 1)
+        return await asyncio.get_running_loop().run_in_executor(self.async_executor, functools.partial(func, *args, **kwargs))
+
+    def get_streaming_stats(self):
+        '''
+        Get the statistics of the stream (see `StreamStats.summary`), None if the device has not streamed.
+        '''
+        stats = getattr(self, 'streaming_stats', None)
+        return None if stats is None else stats.summary()
+
+    def _prepare_streaming(self):
+        if getattr(self, 'streaming_stats', None) is None:
+            self.streaming_stats = StreamStats(self.streaming_freq, shm_name = self._stats_name())
+        self._info_out = 'out' in inspect.signature(self.get_info).parameters
+
+    def _close_stats(self):
+        if getattr(self, 'streaming_stats', None) is not None:
+            self.streaming_stats.close()
+            self.streaming_stats = None
+
+    def _stats_name(self):
+        '''
+        Get the shared memory name that the stats block is named after.
+        '''
+        return self.shm_name
+
+    def _check_memory(self, shm):
+        '''
+        Report the memory options (see `SharedMemoryManager.memory_status`) of a shared memory object that did not take effect.
+        '''
+        for option, reason in shm.memory_status['errors'].items():
+            self.logger.warning('Shared memory {}: {} not in effect, {}.'.format(shm.name, option.replace('_', ' '), reason))
+
+    def _stream_once(self):
+        '''
+        Collect, serialize and publish one sample, and record the latencies of the stages.
+        '''
+        start = time.monotonic_ns()
+        self.capture_timestamp, self.device_timestamp = None, 0
+        info = self.get_info(**self._get_info_kwargs())
+        acquired = time.monotonic_ns()
+        timestamp = self._sample_timestamp(start, acquired)
+        data = self._serialize(info)
+        serialized = time.monotonic_ns()
+        self._publish(data, timestamp, self.device_timestamp)
+        self.streaming_stats.update(start, acquired, serialized, time.monotonic_ns())
+
+    def _sample_timestamp(self, start, acquired):
+        '''
+        Get the monotonic capture time (in ns) of the sample collected by `get_info` between start and acquired.
+        '''
+        if self.capture_timestamp is not None:
+            return self.capture_timestamp
+        return (start + acquired) // 2
+
+    def _get_info_kwargs(self):
+        '''
+        Get the keyword arguments of `get_info` in the streaming loop.
+        '''
+        out = self._streaming_out()
+        if out is None or not self._info_out:
+            return self._streaming_info_kwargs
+        return dict(self._streaming_info_kwargs, out = out)
+
+    def _streaming_out(self):
+        '''
+        Get the buffer that the next sample is collected into, None means no preallocated buffer.
+        '''
+        return getattr(self, 'streaming_buffer', None)
+
+    def _serialize(self, info):
+        '''
+        Convert the device information into the data of the shared memory objects, in the preallocated buffer (if any).
+        '''
+        buffer = self._streaming_out()
+        if buffer is None:
+            return info
+        if isinstance(buffer, tuple):
+            for dst, src in zip(buffer, info):
+                if src is not dst:
+                    np.copyto(dst, src, casting = 'unsafe')
+        elif info is not buffer:
+            np.copyto(buffer, info, casting = 'unsafe')
+        return buffer
+
+    def _publish(self, data, timestamp = None, device_timestamp = 0):
+        '''
+        Publish one sample into the shared memory objects, with its monotonic capture time and its device-native timestamp (in ns).
+        '''
+        pass
+
+    def _close_shm(self):
+        '''
+        Close shared memory objects.
+        '''
+        pass
@@ -0,0 +1,183 @@
+"""
+Stream Monitor (easyrobot-top): a live table of the easyrobot shared memory streams on this host, with the achieved
+rate, the age of the last sample, the sample size and the throughput of every stream, and the latency statistics
+published by the producers. Only the segment headers (and the small stats blocks) are read, so that the monitor
+can be left running during experiments.
+
+Usage:
+    easyrobot-top --interval 1.0
+
+Author: Hongjie Fang
+"""
+
+import sys
+import time
+import argparse
+
+from easyrobot.utils import shm_registry
+from easyrobot.utils.shared_memory import SharedMemoryManager
+from easyrobot.utils.stats import stats_name, stats_from_record
+
+
+_COLUMNS = [
+    ('NAME', '<24'), ('PID', '>8'), ('RATE', '>9'), ('TARGET', '>8'), ('AGE(ms)', '>10'), ('SIZE', '>10'), ('MB/s', '>9'),
+    ('SAMPLES', '>10'), ('GET p50', '>9'), ('GET p99', '>9'), ('JIT p99', '>9'), ('OVERRUNS', '>9')
+]
+
+
+def _format_size(size):
+    for unit in ['B', 'KB', 'MB']:
+        if size < 1024:
+            return '{:.0f}{}'.format(size, unit) if unit == 'B' else '{:.1f}{}'.format(size, unit)
+        size /= 1024
+    return '{:.1f}GB'.format(size)
+
+
+class _MonitoredStream(object):
+    """
+    A monitored stream: the receiver of its segment (and of its stats block), and the previous heartbeat.
+    """
+    def __init__(self, name, pid, size):
+        self.name = name
+        self.pid = pid
+        self.receiver = SharedMemoryManager(name, 1)
+        self.stats_receiver = None
+        self.last_index = None
+        self.last_time = None
+        self.rate = 0.0
+        if not self.receiver.versioned:
+            # Unversioned segments have no header: only their size is known.
+            self.sample_size = size
+        else:
+            self.sample_size = self.receiver.sample_size
+
+    def close(self):
+        self.receiver.close()
+        if self.stats_receiver is not None:
+            self.stats_receiver.close()
+
+
+class StreamMonitor(object):
+    """
+    Stream Monitor.
+    """
+    def __init__(self, names = None):
+        """
+        Initialization.
+
+        Parameters:
+        - names: list of str, optional, default: None, the names of the monitored streams, None means all the streams.
+        """
+        super(StreamMonitor, self).__init__()
+        self.names = names
+        self.streams = {}
+
+    def refresh(self):
+        """
+        Discover the streams, attach to the new ones, detach from the vanished ones, and measure all of them.
+
+        Returns:
+        - A list of rows, one dict per stream.
+        """
+        entries = {entry['name']: entry for entry in shm_registry.list_segments() if entry['alive']}
+        for name in list(self.streams.keys()):
+            if name not in entries or entries[name]['pid'] != self.streams[name].pid:
+                self.streams.pop(name).close()
+        for name, entry in entries.items():
+            if name in self.streams or name.endswith('_stats') and name[:-len('_stats')] in entries:
+                continue
+            if self.names is not None and name not in self.names:
+                continue
+            try:
+                self.streams[name] = _MonitoredStream(name, entry['pid'], entry['size'])
+            except (FileNotFoundError, AttributeError, ValueError):
+                # The segment vanished or is still being initialized.
+                continue
+        rows = []
+        for name in sorted(self.streams.keys()):
+            stream = self.streams[name]
+            if stream.stats_receiver is None and stats_name(name) in entries:
+                try:
+                    stream.stats_receiver = SharedMemoryManager(stats_name(name), 1)
+                except (FileNotFoundError, AttributeError, ValueError):
+                    pass
+            rows.append(self._measure(stream))
+        return rows
+
+    def _measure(self, stream):
+        now = time.monotonic_ns()
+        row = {'name': stream.name, 'pid': stream.pid, 'size': stream.sample_size, 'rate': None, 'age': None, 'samples': None, 'throughput': None, 'stats': None}
+        if not stream.receiver.versioned:
+            return row
+        status = stream.receiver.get_status()
+        if stream.last_index is not None and now > stream.last_time:
+            stream.rate = (status['index'] - stream.last_index) * 1e9 / (now - stream.last_time)
+        stream.last_index, stream.last_time = status['index'], now
+        row['rate'] = stream.rate
+        row['samples'] = status['index'] + 1
+        row['age'] = (now - status['timestamp']) / 1e6 if status['index'] >= 0 else None
+        row['throughput'] = stream.rate * stream.sample_size / 1e6
+        if stream.stats_receiver is not None:
+            record, info = stream.stats_receiver.execute(return_info = True)
+            if info['index'] >= 0:
+                row['stats'] = stats_from_record(record, info['timestamp'])
+        return row
+
+    def render(self, rows):
+        """
+        Render the rows as a text table.
+        """
+        def value(x, fmt):
+            return '-' if x is None else fmt.format(x)
+        lines = [' '.join('{:{}}'.format(title, align) for title, align in _COLUMNS)]
+        for row in rows:
+            stats = row['stats']
+            cells = [
+                row['name'][:24],
+                str(row['pid']),
+                value(row['rate'], '{:.1f}'),
+                value(stats['target_rate'] if stats else None, '{:.0f}'),
+                value(row['age'], '{:.1f}'),
+                _format_size(row['size']),
+                value(row['throughput'], '{:.2f}'),
+                value(row['samples'], '{}'),
+                value(stats['latency_us']['get_info'][50] if stats else None, '{:.0f}us'),
+                value(stats['latency_us']['get_info'][99] if stats else None, '{:.0f}us'),
+                value(stats['jitter_us'][99] if stats else None, '{:.0f}us'),
+                value(stats['overruns'] if stats else None, '{}')
+            ]
+            lines.append(' '.join('{:{}}'.format(cell, align) for cell, (_, align) in zip(cells, _COLUMNS)))
+        return '\n'.join(lines)
+
+    def close(self):
+        for stream in self.streams.values():
+            stream.close()
+        self.streams = {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Live monitor of the easyrobot shared memory streams.')
+    parser.add_argument('--names', nargs = '+', default = None, help = 'names of the monitored streams, all the streams by default')
+    parser.add_argument('--interval', type = float, default = 1.0, help = 'refresh interval (in seconds)')
+    parser.add_argument('--once', action = 'store_true', help = 'print the table once (after one interval) and exit')
+    args = parser.parse_args()
+    monitor = StreamMonitor(args.names)
+    try:
+        # The first refresh only records the heartbeats, from which the rates are measured.
+        monitor.refresh()
+        while True:
+            time.sleep(args.interval)
+            table = monitor.render(monitor.refresh())
+            if args.once:
+                print(table)
+                break
+            sys.stdout.write('\033[H\033[J' + 'easyrobot-top  (registry: {})\n\n'.format(shm_registry.REGISTRY_DIR) + table + '\n')
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.close()
+
+
+if __name__ == '__main__':
+    main()
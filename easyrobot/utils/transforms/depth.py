@@ -0,0 +1,39 @@
+"""
+Depth utilities.
+
+Authors: Hongjie Fang
+"""
+
+import numpy as np
+
+
+def depth_to_meters(depth, depth_scale = 1.0, out = None, roi = None):
+    """
+    Convert a raw depth image into meters (depth / depth_scale), e.g., the np.uint16 depth streams with the
+    "depth_scale" metadata; only the region of interest (if any) is converted.
+
+    Parameters:
+    - depth: np.array of shape (H, W), required, the raw depth image;
+    - depth_scale: float, optional, default: 1.0, the number of depth units per meter;
+    - out: np.array, optional, default: None, the preallocated np.float32 array (of the region shape) that the depth is written into, None means a new array;
+    - roi: (x0, y0, x1, y1), optional, default: None, the region of interest in pixels (x1 and y1 excluded), None means the whole image.
+
+    Returns:
+    - The depth (of the region) in meters, as np.float32.
+    """
+    if roi is not None:
+        x0, y0, x1, y1 = roi
+        depth = depth[y0: y1, x0: x1]
+    if out is None:
+        out = np.empty(depth.shape, dtype = np.float32)
+    np.multiply(depth, np.float32(1.0 / depth_scale), out = out, casting = 'unsafe')
+    return out
+
+
+def stream_depth_scale(meta):
+    """
+    Get the number of depth units per meter of a depth stream from its shared memory metadata; streams without the "depth_scale" metadata are already in meters.
+    """
+    if meta is None:
+        return 1.0
+    return meta.get('depth_scale', 1.0)
@@ -0,0 +1,197 @@
+"""
+Stream Watchdog: flags the streams that stop updating, e.g., when a device read hangs, and triggers callbacks
+(such as stopping the robot). The heartbeat of a stream is the sample index in the header of its versioned
+shared memory segment, which the producer bumps at every sample anyway, so that the watchdog adds nothing
+(and no lock) to the streaming loops.
+
+Usage:
+    watchdog = StreamWatchdog(multiple = 3.0)
+    watchdog.watch('gripper', on_stale = lambda name, status: robot.stop())
+    watchdog.start()
+
+Author: Hongjie Fang
+"""
+
+import time
+import logging
+import threading
+
+from easyrobot.utils.logger import ColoredLogger
+from easyrobot.utils.shared_memory import SharedMemoryManager
+
+
+class _WatchedStream(object):
+    """
+    A watched stream: its receiver, its staleness timeout and its heartbeat observations.
+    """
+    def __init__(self, name, rate, multiple, on_stale, on_recover):
+        self.name = name
+        self.receiver = SharedMemoryManager(name, 1, versioned = True)
+        self.rate = rate if rate is not None else self.receiver.meta.get('rate')
+        if not self.rate:
+            raise AttributeError('The rate of stream {} is unknown, and should be given to the watchdog.'.format(name))
+        self.timeout_ns = int(multiple * 1e9 / self.rate)
+        self.on_stale = on_stale
+        self.on_recover = on_recover
+        self.heartbeat = self.receiver.get_status()['index']
+        self.last_beat = time.monotonic_ns()
+        self.stale = False
+        self.stale_count = 0
+
+
+class StreamWatchdog(object):
+    """
+    Stream Watchdog.
+    """
+    def __init__(
+        self,
+        multiple = 3.0,
+        interval = None,
+        on_stale = None,
+        on_recover = None,
+        logger_name: str = "Stream Watchdog"
+    ):
+        """
+        Initialization.
+
+        Parameters:
+        - multiple: float, optional, default: 3.0, a stream is stale if its heartbeat does not change within this multiple of its period;
+        - interval: float, optional, default: None, the interval (in seconds) between two checks, None means half of the shortest staleness timeout;
+        - on_stale: callable, optional, default: None, the default callback `on_stale(name, status)` when a stream becomes stale;
+        - on_recover: callable, optional, default: None, the default callback `on_recover(name, status)` when a stale stream updates again;
+        - logger_name: str, optional, default: "Stream Watchdog", the name of the logger.
+        """
+        super(StreamWatchdog, self).__init__()
+        logging.setLoggerClass(ColoredLogger)
+        self.logger = logging.getLogger(logger_name)
+        self.multiple = multiple
+        self.interval = interval
+        self.on_stale = on_stale
+        self.on_recover = on_recover
+        self.streams = {}
+        self.lock = threading.Lock()
+        self.is_running = False
+
+    def watch(self, name, rate = None, multiple = None, on_stale = None, on_recover = None):
+        """
+        Watch a stream.
+
+        Parameters:
+        - name: str, required, the name of the (versioned) shared memory stream;
+        - rate: float, optional, default: None, the rate (in Hz) of the stream, None means the published rate;
+        - multiple: float, optional, default: None, the staleness multiple of the stream, None means the multiple of the watchdog;
+        - on_stale, on_recover: callable, optional, default: None, the callbacks of the stream, None means the callbacks of the watchdog.
+        """
+        stream = _WatchedStream(
+            name,
+            rate,
+            self.multiple if multiple is None else multiple,
+            self.on_stale if on_stale is None else on_stale,
+            self.on_recover if on_recover is None else on_recover
+        )
+        with self.lock:
+            if name in self.streams:
+                self.streams[name].receiver.close()
+            self.streams[name] = stream
+
+    def unwatch(self, name):
+        """
+        Stop watching a stream.
+        """
+        with self.lock:
+            stream = self.streams.pop(name, None)
+            if stream is not None:
+                stream.receiver.close()
+
+    def check(self):
+        """
+        Check the heartbeats of all the streams once, and trigger the callbacks of the streams whose state changed.
+
+        Returns:
+        - A dict mapping the stream names to their status (see `get_status`).
+        """
+        with self.lock:
+            streams = list(self.streams.values())
+        result = {}
+        for stream in streams:
+            # The receivers are closed under the lock (by `watch` and `unwatch`), so that a closed receiver is never read;
+            # the callbacks run outside the lock, so that they can watch or unwatch streams.
+            with self.lock:
+                if self.streams.get(stream.name) is not stream:
+                    continue
+                heartbeat = stream.receiver.get_status()['index']
+            now = time.monotonic_ns()
+            if heartbeat != stream.heartbeat:
+                stream.heartbeat = heartbeat
+                stream.last_beat = now
+                if stream.stale:
+                    stream.stale = False
+                    self.logger.info('Stream {} recovered.'.format(stream.name))
+                    self._callback(stream, stream.on_recover, now)
+            elif not stream.stale and now - stream.last_beat > stream.timeout_ns:
+                stream.stale = True
+                stream.stale_count += 1
+                self.logger.warning('Stream {} is stale: no update in {:.1f} ms.'.format(stream.name, (now - stream.last_beat) / 1e6))
+                self._callback(stream, stream.on_stale, now)
+            result[stream.name] = self._status(stream, now)
+        return result
+
+    def _status(self, stream, now):
+        return {
+            'stale': stream.stale,
+            'heartbeat': stream.heartbeat,
+            'age': (now - stream.last_beat) / 1e9,
+            'timeout': stream.timeout_ns / 1e9,
+            'stale_count': stream.stale_count
+        }
+
+    def _callback(self, stream, callback, now):
+        if callback is None:
+            return
+        try:
+            callback(stream.name, self._status(stream, now))
+        except Exception:
+            self.logger.exception('Callback of stream {} failed.'.format(stream.name))
+
+    def get_status(self):
+        """
+        Get the status of the streams: whether the stream is "stale", its "heartbeat" (the latest sample index),
+        the "age" (in seconds) since its heartbeat last changed, its staleness "timeout" (in seconds), and the number of times it became stale.
+        """
+        now = time.monotonic_ns()
+        with self.lock:
+            return {name: self._status(stream, now) for name, stream in self.streams.items()}
+
+    def start(self):
+        """
+        Start checking the streams in a background thread.
+        """
+        self.is_running = True
+        self.thread = threading.Thread(target = self.watching_thread)
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def watching_thread(self):
+        self.logger.info('Start watching ...')
+        while self.is_running:
+            self.check()
+            if self.interval is not None:
+                interval = self.interval
+            else:
+                with self.lock:
+                    interval = min([stream.timeout_ns / 2e9 for stream in self.streams.values()] + [0.1])
+            time.sleep(interval)
+
+    def stop(self):
+        """
+        Stop checking the streams, and close the receivers.
+        """
+        self.is_running = False
+        if getattr(self, 'thread', None) is not None:
+            self.thread.join()
+            self.thread = None
+        with self.lock:
+            for stream in self.streams.values():
+                stream.receiver.close()
+            self.streams = {}
+        self.logger.info('Stop watching.')
@@ -0,0 +1,197 @@
+"""
+Device Worker: runs a device in its own process, so that its streaming (e.g., the conversions of camera frames)
+never competes with the control loop for the GIL. The device publishes into shared memory as usual, and the
+returned proxy forwards the calls (streaming, stop_streaming, stop, action, ...) over a control channel.
+
+Usage:
+    camera = get_rgbd_camera(name = 'realsense', serial = '...', shm_name = 'camera', process = True)
+    camera.streaming()
+    print(camera.health())
+
+Author: Hongjie Fang
+"""
+
+import os
+import time
+import logging
+import traceback
+import threading
+import multiprocessing as mp
+
+from easyrobot.utils.logger import ColoredLogger
+
+
+class DeviceProcess(object):
+    """
+    Proxy of a device running in a worker process.
+    """
+    def __init__(
+        self,
+        factory,
+        params,
+        start_method = 'spawn',
+        timeout = 60.0,
+        logger_name: str = "Device Process"
+    ):
+        """
+        Initialization: start the worker process and build the device in it.
+
+        Parameters:
+        - factory: callable, required, the (importable) function that builds the device from the parameters, e.g., `get_robot`;
+        - params: dict, required, the parameters of the device;
+        - start_method: str, optional, default: 'spawn', the multiprocessing start method of the worker;
+        - timeout: float, optional, default: 60.0, the timeout (in seconds) of the device initialization;
+        - logger_name: str, optional, default: "Device Process", the name of the logger.
+        """
+        super(DeviceProcess, self).__init__()
+        logging.setLoggerClass(ColoredLogger)
+        self.logger = logging.getLogger(logger_name)
+        self.lock = threading.Lock()
+        # Every request is numbered, so that the late replies of timed-out calls are told apart (request 0 builds the device).
+        self.request_id = 0
+        context = mp.get_context(start_method)
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target = _worker_main, args = (factory, params, child_conn), daemon = True)
+        self.process.start()
+        child_conn.close()
+        self.device_info = self._receive(0, timeout)
+        self.logger.info('Device {} runs in process {}.'.format(self.device_info['class'], self.process.pid))
+
+    def call(self, method, *args, timeout = None, **kwargs):
+        """
+        Call a method of the device in the worker process, and return its result.
+
+        Parameters:
+        - method: str, required, the name of the method;
+        - timeout: float, optional, default: None, the timeout (in seconds) of the call (including the wait for the calls in progress), None means no timeout;
+        - args, kwargs: the arguments of the method.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self.lock.acquire(timeout = -1 if timeout is None else timeout):
+            raise TimeoutError('The worker process of the device is busy with another call.')
+        try:
+            if not self.process.is_alive():
+                raise RuntimeError('The worker process of the device has exited with code {}.'.format(self.process.exitcode))
+            self.request_id += 1
+            self.conn.send((self.request_id, method, args, kwargs))
+            return self._receive(self.request_id, None if deadline is None else max(deadline - time.monotonic(), 0))
+        finally:
+            self.lock.release()
+
+    def _receive(self, request_id, timeout):
+        """
+        Receive the reply of the request, dropping the late replies of the earlier (timed-out) requests.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if not self.conn.poll(None if deadline is None else max(deadline - time.monotonic(), 0)):
+                raise TimeoutError('The worker process of the device does not respond.')
+            try:
+                reply_id, status, result = self.conn.recv()
+            except EOFError:
+                self.process.join(1.0)
+                raise RuntimeError('The worker process of the device has exited with code {}.'.format(self.process.exitcode))
+            if reply_id == request_id:
+                break
+        if status == 'error':
+            raise RuntimeError('Error in the worker process of the device:\n{}'.format(result))
+        return result
+
+    def __getattr__(self, name):
+        # Only called for attributes missing in the proxy: forward the public methods of the device.
+        if name.startswith('_') or name not in self.__dict__.get('device_info', {}).get('methods', []):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    def streaming(self, *args, **kwargs):
+        '''
+        Start streaming in the worker process.
+        '''
+        return self.call('streaming', *args, **kwargs)
+
+    def stop_streaming(self, permanent = True):
+        '''
+        Stop streaming in the worker process.
+
+        Parameters:
+        - permanent: bool, optional, default: True, whether the streaming process is stopped permanently.
+        '''
+        return self.call('stop_streaming', permanent = permanent)
+
+    def health(self, timeout = 1.0):
+        '''
+        Get the health status of the worker: whether the process is alive and responsive, its pid and uptime,
+        and the streaming status of the device (streaming flag, ticks and overruns of the streaming schedule).
+
+        Parameters:
+        - timeout: float, optional, default: 1.0, the timeout (in seconds) of the status request.
+        '''
+        status = {'alive': self.process.is_alive(), 'responsive': False, 'pid': self.process.pid, 'exitcode': self.process.exitcode}
+        if not status['alive']:
+            return status
+        try:
+            status.update(self.call('__health__', timeout = timeout))
+            status['responsive'] = True
+        except (RuntimeError, TimeoutError):
+            pass
+        return status
+
+    def stop(self, timeout = 10.0):
+        '''
+        Stop the device, and let the worker process exit.
+
+        Parameters:
+        - timeout: float, optional, default: 10.0, the time (in seconds) to wait for the worker before terminating it.
+        '''
+        if self.process.is_alive():
+            try:
+                self.call('__stop__', timeout = timeout)
+            except (RuntimeError, TimeoutError, OSError) as e:
+                self.logger.warning('Failed to stop the device gracefully: {}'.format(e))
+        self.process.join(timeout)
+        if self.process.is_alive():
+            # SIGTERM still lets the worker release its shared memory segments.
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+        self.logger.info('Worker process {} exited.'.format(self.process.pid))
+
+
+def _worker_main(factory, params, conn):
+    """
+    Main loop of the worker process: build the device, then serve the calls from the control channel.
+    """
+    start_time = time.time()
+    try:
+        device = factory(**params)
+    except Exception:
+        conn.send((0, 'error', traceback.format_exc()))
+        return
+    methods = [name for name in dir(device) if not name.startswith('_') and callable(getattr(device, name, None))]
+    conn.send((0, 'ok', {'class': type(device).__name__, 'methods': methods}))
+    while True:
+        try:
+            request_id, method, args, kwargs = conn.recv()
+        except (EOFError, OSError):
+            # The parent is gone: stop the device, so that its resources (e.g., shared memory) are released.
+            device.stop()
+            return
+        try:
+            if method == '__stop__':
+                device.stop()
+                conn.send((request_id, 'ok', None))
+                return
+            elif method == '__health__':
+                scheduler = getattr(device, 'streaming_scheduler', None)
+                result = {
+                    'pid': os.getpid(),
+                    'uptime': time.time() - start_time,
+                    'is_streaming': getattr(device, 'is_streaming', False),
+                    'ticks': scheduler.tick if scheduler is not None else 0,
+                    'overruns': scheduler.overruns if scheduler is not None else 0
+                }
+            else:
+                result = getattr(device, method)(*args, **kwargs)
+            conn.send((request_id, 'ok', result))
+        except Exception:
+            conn.send((request_id, 'error', traceback.format_exc()))
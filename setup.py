@@ -11,6 +11,11 @@ setup(
     maintainer_email = "tony.fang.galaxies@gmail.com, galaxies@sjtu.edu.cn",
     packages = find_packages(exclude = ['docs', 'assets']),
     include_package_data = True,
+    entry_points = {
+        'console_scripts': [
+            'easyrobot-top = easyrobot.utils.top:main'
+        ]
+    },
     install_requires = [
         'numpy',
         'pyserial',
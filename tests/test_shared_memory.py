@@ -0,0 +1,34 @@
+import time
+import threading
+import pytest
+import numpy as np
+
+from easyrobot.utils.shared_memory import SharedMemoryManager
+
+
+def test_wait_triple_buffer_notify():
+    sender = SharedMemoryManager('test_wait_triple_buffer', 0, (4, ), np.float32, triple_buffer = True, notify = True)
+    receiver = SharedMemoryManager('test_wait_triple_buffer', 1)
+    try:
+        sender.execute(np.zeros(4, dtype = np.float32))
+        index = receiver.get_status()['index']
+        timer = threading.Timer(0.1, lambda: sender.execute(np.ones(4, dtype = np.float32)))
+        start = time.monotonic()
+        timer.start()
+        assert receiver.wait(index, timeout = 2.0)
+        assert time.monotonic() - start < 1.0
+        assert np.all(receiver.execute() == 1)
+        timer.join()
+    finally:
+        receiver.close()
+        sender.close()
+
+
+def test_duplicate_sender_rejected():
+    sender = SharedMemoryManager('test_duplicate_sender', 0, (4, ), np.float32, versioned = True)
+    try:
+        with pytest.raises(FileExistsError):
+            SharedMemoryManager('test_duplicate_sender', 0, (5, ), np.float32, versioned = True)
+        sender.execute(np.ones(4, dtype = np.float32))
+    finally:
+        sender.close()